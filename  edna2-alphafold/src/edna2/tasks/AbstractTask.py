@@ -33,13 +33,43 @@ import traceback
 import jsonschema
 import subprocess
 import socket
+import threading
 
 from edna2.utils import UtilsPath
 from edna2.utils import UtilsLogging
 from edna2.utils import UtilsConfig
+from edna2.utils import UtilsJson
 
 logger = UtilsLogging.getLogger()
 
+# billiard Manager shared by the tasks created in this process, see getManager
+_manager = None
+_managerPid = None
+_managerLock = threading.Lock()
+
+
+def _resetManagerLock():
+    # The lock may have been held by another thread at fork time
+    global _managerLock
+    _managerLock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_resetManagerLock)
+
+
+def getManager():
+    """
+    Returns the billiard Manager holding the in/out data of the tasks
+    created in this process. A Manager is a server process of its own, so
+    it is started once per process instead of once per task.
+    """
+    global _manager, _managerPid
+    with _managerLock:
+        if _managerPid != os.getpid():
+            _manager = billiard.Manager()
+            _managerPid = os.getpid()
+    return _manager
+
 
 class EDNA2Process(billiard.Process):
     """
@@ -75,9 +105,9 @@ class AbstractTask():  # noqa R0904
     """
 
     def __init__(self, inData, workingDirectorySuffix=None):
-        self._dictInOut = billiard.Manager().dict()
-        self._dictInOut["inData"] = json.dumps(inData, default=str)
-        self._dictInOut["outData"] = json.dumps({})
+        self._dictInOut = getManager().dict()
+        self._dictInOut["inData"] = UtilsJson.dumps(inData)
+        self._dictInOut["outData"] = UtilsJson.dumps({})
         self._dictInOut["isFailure"] = False
         self._dictInOut["timeOut"] = self.setTimeOut()
         self._dictInOut["timeoutExit"] = False
@@ -141,18 +171,18 @@ class AbstractTask():  # noqa R0904
             os.rmdir(str(self._workingDirectory))
 
     def getInData(self):
-        return json.loads(self._dictInOut["inData"])
+        return UtilsJson.loads(self._dictInOut["inData"])
 
     def setInData(self, inData):
-        self._dictInOut["inData"] = json.dumps(inData, default=str)
+        self._dictInOut["inData"] = UtilsJson.dumps(inData)
 
     inData = property(getInData, setInData)
 
     def getOutData(self):
-        return json.loads(self._dictInOut["outData"])
+        return UtilsJson.loads(self._dictInOut["outData"])
 
     def setOutData(self, outData):
-        self._dictInOut["outData"] = json.dumps(outData, default=str)
+        self._dictInOut["outData"] = UtilsJson.dumps(outData)
 
     outData = property(getOutData, setOutData)
 
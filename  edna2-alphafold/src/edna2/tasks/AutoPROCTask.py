@@ -25,16 +25,85 @@ __date__ = "25/04/2023"
 import os
 import shutil
 import tempfile
-import numpy as np
 from pathlib import Path
-import gzip
 import time
 import re
-import json
 from datetime import datetime
 import socket
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 STRF_TEMPLATE = "%a %b %d %H:%M:%S %Y"
+# time stamps in the autoPROC ISPyB XML, e.g. "Tue Apr 25 14:02:11 UTC 2023"
+AUTOPROC_TIME_TEMPLATE = "%a %b %d %H:%M:%S %Z %Y"
+# statistics reported as fractions by autoPROC but stored as percentages in ISPyB
+PERCENT_STATISTICS_KEYS = frozenset(
+    [
+        "rMerge",
+        "rMeasWithinIPlusIMinus",
+        "rMeasAllIPlusIMinus",
+        "rPimWithinIPlusIMinus",
+        "rPimAllIPlusIMinus",
+        "ccAnomalous",
+    ]
+)
+# strings accepted by convertStrToIntOrFloat, the int group is set for
+# integers and None for floats
+NUMBER_RE = re.compile(
+    r"\s*[-+]?(?:(?P<int>\d+)|(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|nan|inf(?:inity)?)\s*",
+    re.IGNORECASE,
+)
+# autoPROC scaling statistics keys renamed to the ISPyB names
+SCALING_STATISTICS_KEYS = {
+    "rMerge": "rmerge",
+    "rMeasWithinIPlusIMinus": "rmeasWithinIplusIminus",
+    "rMeasAllIPlusIMinus": "rmeasAllIplusIminus",
+    "rPimWithinIPlusIMinus": "rpimWithinIplusIminus",
+    "rPimAllIPlusIMinus": "rpimAllIplusIminus",
+    "meanIOverSigI": "meanIoverSigI",
+    "ccAnomalous": "ccAno",
+    "DanoOverSigDano": "sigAno",
+}
+# autoPROC keys renamed to the ISPyB names
+AUTOPROC_KEYS = {
+    "refinedCell_a": "refinedCellA",
+    "refinedCell_b": "refinedCellB",
+    "refinedCell_c": "refinedCellC",
+    "refinedCell_alpha": "refinedCellAlpha",
+    "refinedCell_beta": "refinedCellBeta",
+    "refinedCell_gamma": "refinedCellGamma",
+}
+AUTOPROC_INTEGRATION_KEYS = {
+    "cell_a": "cellA",
+    "cell_b": "cellB",
+    "cell_c": "cellC",
+    "cell_alpha": "cellAlpha",
+    "cell_beta": "cellBeta",
+    "cell_gamma": "cellGamma",
+    "refinedXBeam": "refinedXbeam",
+    "refinedYBeam": "refinedYbeam",
+}
+# autoPROC run directories in the AutoPROCExecTask working directory
+AUTOPROC_EXEC_DIR_RE = re.compile(r"AutoPROCExec_(\d+)")
+# autoPROC output files gzip'ed to the results directory (source, target suffix)
+AUTOPROC_GZIP_FILES = [
+    ("Data_1_autoPROC_STARANISO_all.cif", "autoPROC_STARANISO_all.cif.gz"),
+    ("Data_2_autoPROC_TRUNCATE_all.cif", "autoPROC_TRUNCATE_all.cif.gz"),
+    ("XDS_ASCII.HKL", "XDS_ASCII.HKL.gz"),
+]
+# autoPROC output files copied to the results directory with the pyarch prefix
+AUTOPROC_RESULT_FILES = [
+    "report.pdf",
+    "report_staraniso.pdf",
+    "staraniso_alldata-unique.mtz",
+    "staraniso_alldata-unique.stats",
+    "staraniso_alldata-unique.table1",
+    "summary_inlined.html",
+    "summary.tar.gz",
+    "truncate-unique.mtz",
+    "truncate-unique.stats",
+    "truncate-unique.table1",
+]
 
 # for the os.chmod
 from stat import *
@@ -48,6 +117,7 @@ from edna2.utils import UtilsConfig
 from edna2.utils import UtilsLogging
 from edna2.utils import UtilsIspyb
 from edna2.utils import UtilsXML
+from edna2.utils import UtilsJson
 from edna2.utils import UtilsCCTBX
 from edna2.utils import UtilsImage
 
@@ -63,6 +133,23 @@ XSCALE_HEADER="""\
    LIMIT     OBSERVED  UNIQUE  POSSIBLE     OF DATA   observed  expected                                      Corr\n"""
 
 
+@functools.lru_cache(maxsize=None)
+def getAutoPROCOptions(site, configDir):
+    """
+    Returns the autoPROC_* options of the AutoPROCTask config section
+    as a tuple of (key, value) pairs, parsed once per site and config
+    directory.
+    """
+    config = UtilsConfig.getConfig(site, caseSensitive=True)
+    if "AutoPROCTask" not in config:
+        return ()
+    return tuple(
+        (k, v)
+        for k, v in config["AutoPROCTask"].items()
+        if k.startswith("autoPROC_")
+    )
+
+
 class AutoPROCTask(AbstractTask):
     def getInDataSchema(self):
         return {
@@ -87,38 +174,26 @@ class AutoPROCTask(AbstractTask):
     def setFailure(self):
         self._dictInOut["isFailure"] = True
         if self.doUploadIspyb:
-            if self.integrationId is not None and self.programId is not None:
-                ISPyBStoreAutoProcResults.setIspybToFailed(
+            listAutoProcIds = [
+                (programId, integrationId)
+                for programId, integrationId in [
+                    (self.programId, self.integrationId),
+                    (self.programIdStaraniso, self.integrationIdStaraniso),
+                ]
+                if integrationId is not None and programId is not None
+            ]
+            if listAutoProcIds:
+                ISPyBStoreAutoProcResults.setIspybToFailedMulti(
                     dataCollectionId=self.dataCollectionId,
-                    autoProcProgramId=self.programId,
-                    autoProcIntegrationId=self.integrationId,
+                    listAutoProcIds=listAutoProcIds,
                     processingCommandLine=self.processingCommandLine,
                     processingPrograms=self.processingPrograms,
                     isAnom=False,
                     timeStart=self.startDateTime,
                     timeEnd=datetime.now().isoformat(timespec="seconds"),
                 )
-                self.logToIspyb(
-                    self.integrationId, "Indexing", "Failed", "AutoPROC ended"
-                )
-
-            if (
-                self.integrationIdStaraniso is not None
-                and self.programIdStaraniso is not None
-            ):
-                ISPyBStoreAutoProcResults.setIspybToFailed(
-                    dataCollectionId=self.dataCollectionId,
-                    autoProcProgramId=self.programIdStaraniso,
-                    autoProcIntegrationId=self.integrationIdStaraniso,
-                    processingCommandLine=self.processingCommandLine,
-                    processingPrograms=self.processingPrograms,
-                    isAnom=False,
-                    timeStart=self.startDateTime,
-                    timeEnd=datetime.now().isoformat(timespec="seconds"),
-                )
-                self.logToIspyb(
-                    self.integrationIdStaraniso, "Indexing", "Failed", "AutoPROC ended"
-                )
+            for _, integrationId in listAutoProcIds:
+                self.logToIspyb(integrationId, "Indexing", "Failed", "AutoPROC ended")
 
     def run(self, inData):
         UtilsLogging.addLocalFileHandler(
@@ -257,23 +332,25 @@ class AutoPROCTask(AbstractTask):
         self.resultsDirectory.mkdir(exist_ok=True, parents=True, mode=0o755)
 
         if self.waitForFiles:
+            # wait for the first and the last image at the same time
             logger.info("Waiting for start image: {0}".format(pathToStartImage))
             waitFileFirst = WaitFileTask(
                 inData={"file": pathToStartImage, "expectedSize": 100000}
             )
-            waitFileFirst.execute()
+            logger.info("Waiting for end image: {0}".format(pathToEndImage))
+            waitFileLast = WaitFileTask(
+                inData={"file": pathToEndImage, "expectedSize": 100000}
+            )
+            waitFileFirst.start()
+            waitFileLast.start()
+            waitFileFirst.join()
+            waitFileLast.join()
             if waitFileFirst.outData["timedOut"]:
                 logger.warning(
                     "Timeout after {0:d} seconds waiting for the first image {1}!".format(
                         waitFileFirst.outData["timeOut"], pathToStartImage
                     )
                 )
-
-            logger.info("Waiting for end image: {0}".format(pathToEndImage))
-            waitFileLast = WaitFileTask(
-                inData={"file": pathToEndImage, "expectedSize": 100000}
-            )
-            waitFileLast.execute()
             if waitFileLast.outData["timedOut"]:
                 logger.warning(
                     "Timeout after {0:d} seconds waiting for the last image {1}!".format(
@@ -285,22 +362,15 @@ class AutoPROCTask(AbstractTask):
         if self.doUploadIspyb:
             # set ISPyB to running
             (
-                self.integrationId,
-                self.programId,
-            ) = ISPyBStoreAutoProcResults.setIspybToRunning(
+                (self.integrationId, self.programId),
+                (self.integrationIdStaraniso, self.programIdStaraniso),
+            ) = ISPyBStoreAutoProcResults.setIspybToRunningMulti(
                 dataCollectionId=self.dataCollectionId,
                 processingCommandLine=self.processingCommandLine,
-                processingPrograms=self.processingPrograms,
-                isAnom=self.anomalous,
-                timeStart=self.startDateTime,
-            )
-            (
-                self.integrationIdStaraniso,
-                self.programIdStaraniso,
-            ) = ISPyBStoreAutoProcResults.setIspybToRunning(
-                dataCollectionId=self.dataCollectionId,
-                processingCommandLine=self.processingCommandLine,
-                processingPrograms=self.processingProgramsStaraniso,
+                listProcessingPrograms=[
+                    self.processingPrograms,
+                    self.processingProgramsStaraniso,
+                ],
                 isAnom=self.anomalous,
                 timeStart=self.startDateTime,
             )
@@ -319,11 +389,11 @@ class AutoPROCTask(AbstractTask):
             "anomalous": self.anomalous,
         }
         if self.doUploadIspyb:
-            self.logToIspyb(
-                self.integrationId, "Indexing", "Launched", "AutoPROC started"
-            )
-            self.logToIspyb(
-                self.integrationIdStaraniso, "Indexing", "Launched", "AutoPROC started"
+            self.logToIspybMulti(
+                [self.integrationId, self.integrationIdStaraniso],
+                "Indexing",
+                "Launched",
+                "AutoPROC started",
             )
 
         autoPROCExec = AutoPROCExecTask(
@@ -339,123 +409,80 @@ class AutoPROCTask(AbstractTask):
         self.endDateTime = datetime.now().isoformat(timespec="seconds")
 
         ispybXml = self.autoPROCExecDir / "autoPROC.xml"
-        if ispybXml.is_file():
-            self.outData["ispybXml"] = str(ispybXml)
-            autoProcContainer = self.autoPROCXMLtoISPyBdict(
-                xml_path=ispybXml,
-                data_collection_id=self.dataCollectionId,
-                program_id=self.programId,
-                integration_id=self.integrationId,
-                processing_programs=self.processingPrograms,
-                anomalous=self.anomalous,
-            )
-
         ispybXmlStaraniso = self.autoPROCExecDir / "autoPROC_staraniso.xml"
-        if ispybXmlStaraniso.is_file():
-            self.outData["ispybXml_staraniso"] = str(ispybXmlStaraniso)
-            autoProcContainerStaraniso = self.autoPROCXMLtoISPyBdict(
-                xml_path=ispybXmlStaraniso,
-                data_collection_id=self.dataCollectionId,
-                program_id=self.programIdStaraniso,
-                integration_id=self.integrationIdStaraniso,
-                processing_programs=self.processingProgramsStaraniso,
-                anomalous=self.anomalous,
-            )
+        # the two containers are independent, convert them side by side
+        futureContainer, futureContainerStaraniso = None, None
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            if ispybXml.is_file():
+                self.outData["ispybXml"] = str(ispybXml)
+                futureContainer = executor.submit(
+                    self.autoPROCXMLtoISPyBdict,
+                    xml_path=ispybXml,
+                    data_collection_id=self.dataCollectionId,
+                    program_id=self.programId,
+                    integration_id=self.integrationId,
+                    processing_programs=self.processingPrograms,
+                    anomalous=self.anomalous,
+                )
+            if ispybXmlStaraniso.is_file():
+                self.outData["ispybXml_staraniso"] = str(ispybXmlStaraniso)
+                futureContainerStaraniso = executor.submit(
+                    self.autoPROCXMLtoISPyBdict,
+                    xml_path=ispybXmlStaraniso,
+                    data_collection_id=self.dataCollectionId,
+                    program_id=self.programIdStaraniso,
+                    integration_id=self.integrationIdStaraniso,
+                    processing_programs=self.processingProgramsStaraniso,
+                    anomalous=self.anomalous,
+                )
+        if futureContainer is not None:
+            autoProcContainer = futureContainer.result()
+        if futureContainerStaraniso is not None:
+            autoProcContainerStaraniso = futureContainerStaraniso.result()
 
         # get CIF Files and gzip them
-        autoPROCStaranisoAllCif = (
-            self.autoPROCExecDir / "Data_1_autoPROC_STARANISO_all.cif"
-        )
-        autoPROCStaranisoAllCifGz = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_autoPROC_STARANISO_all.cif.gz"
-        )
-        autoPROCTruncateAllCif = (
-            self.autoPROCExecDir / "Data_2_autoPROC_TRUNCATE_all.cif"
-        )
-        autoPROCTruncateAllCifGz = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_autoPROC_TRUNCATE_all.cif.gz"
-        )
-        autoPROCXdsAsciiHkl = self.autoPROCExecDir / "XDS_ASCII.HKL"
-        autoPROCXdsAsciiHklGz = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_XDS_ASCII.HKL.gz"
-        )
+        listGzipFiles = [
+            (
+                self.autoPROCExecDir / src,
+                self.resultsDirectory / f"{self.pyarchPrefix}_{dst}",
+            )
+            for src, dst in AUTOPROC_GZIP_FILES
+        ]
 
-        try:
-            logger.debug(f"gzip'ing {autoPROCStaranisoAllCif}")
-            with open(autoPROCStaranisoAllCif, "rb") as fp_in:
-                with gzip.open(autoPROCStaranisoAllCifGz, "wb") as fp_out:
-                    shutil.copyfileobj(fp_in, fp_out)
-        except:
-            logger.error(f"gzip'ing {autoPROCStaranisoAllCif} failed.")
-        try:
-            logger.debug(f"gzip'ing {autoPROCTruncateAllCif}")
-            with open(autoPROCTruncateAllCif, "rb") as fp_in:
-                with gzip.open(autoPROCTruncateAllCifGz, "wb") as fp_out:
-                    shutil.copyfileobj(fp_in, fp_out)
-        except:
-            logger.error(f"gzip'ing {autoPROCTruncateAllCif} failed.")
-        try:
-            logger.debug(f"gzip'ing {autoPROCXdsAsciiHkl}")
-            with open(autoPROCXdsAsciiHkl, "rb") as fp_in:
-                with gzip.open(autoPROCXdsAsciiHklGz, "wb") as fp_out:
-                    shutil.copyfileobj(fp_in, fp_out)
-        except:
-            logger.error(f"gzip'ing {autoPROCXdsAsciiHkl} failed.")
+        # the three files are compressed at once, share the cores between them
+        maxNoProcessors = UtilsConfig.get(
+            "AutoPROCTask", "maxNoProcessors", os.cpu_count()
+        )
+        nprocGzip = max(1, int(maxNoProcessors or 1) // 3)
+        gzipLevel = int(UtilsConfig.get("AutoPROCTask", "gzipLevel", 1))
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = {
+                executor.submit(
+                    UtilsPath.gzipFile, src, dst, nprocGzip, gzipLevel
+                ): src
+                for src, dst in listGzipFiles
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception:
+                    logger.error(f"gzip'ing {futures[future]} failed.")
 
         # copy files to results directory
         autoPROCLogFile = autoPROCExec.outData.get("logFile")
-        autoPROCReportPdf = self.autoPROCExecDir / "report.pdf"
-        autoPROCStaranisoReportPdf = self.autoPROCExecDir / "report_staraniso.pdf"
-        autoPROCStaranisoAllDataUniqueMtz = (
-            self.autoPROCExecDir / "staraniso_alldata-unique.mtz"
-        )
+        listCopyFiles = [
+            (autoPROCLogFile, self.resultsDirectory / f"{self.pyarchPrefix}_autoPROC.log")
+        ] + [
+            (
+                self.autoPROCExecDir / fileName,
+                self.resultsDirectory / f"{self.pyarchPrefix}_{fileName}",
+            )
+            for fileName in AUTOPROC_RESULT_FILES
+        ]
         autoPROCStaranisoAllDataUniqueStats = (
             self.autoPROCExecDir / "staraniso_alldata-unique.stats"
         )
-        autoPROCStaranisoAllDataUniqueTable1 = (
-            self.autoPROCExecDir / "staraniso_alldata-unique.table1"
-        )
-        autoPROCSummaryInlinedHtml = self.autoPROCExecDir / "summary_inlined.html"
-        autoPROCSummaryTarGz = self.autoPROCExecDir / "summary.tar.gz"
-        autoPROCTruncateUniqueMtz = self.autoPROCExecDir / "truncate-unique.mtz"
         autoPROCTruncateUniqueStats = self.autoPROCExecDir / "truncate-unique.stats"
-        autoPROCTruncateUniqueTable1 = self.autoPROCExecDir / "truncate-unique.table1"
-
-        autoPROCLogFile_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_autoPROC.log"
-        )
-        autoPROCReportPdf_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_report.pdf"
-        )
-        autoPROCStaranisoReportPdf_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_report_staraniso.pdf"
-        )
-        autoPROCStaranisoAllDataUniqueMtz_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_staraniso_alldata-unique.mtz"
-        )
-        autoPROCStaranisoAllDataUniqueStats_resultsDir = (
-            self.resultsDirectory
-            / f"{self.pyarchPrefix}_staraniso_alldata-unique.stats"
-        )
-        autoPROCStaranisoAllDataUniqueTable1_resultsDir = (
-            self.resultsDirectory
-            / f"{self.pyarchPrefix}_staraniso_alldata-unique.table1"
-        )
-        autoPROCSummaryInlinedHtml_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_summary_inlined.html"
-        )
-        autoPROCSummaryTarGz_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_summary.tar.gz"
-        )
-        autoPROCTruncateUniqueMtz_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_truncate-unique.mtz"
-        )
-        autoPROCTruncateUniqueStats_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_truncate-unique.stats"
-        )
-        autoPROCTruncateUniqueTable1_resultsDir = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_truncate-unique.table1"
-        )
         statsXscaleStyle_resultsDir = (
             self.resultsDirectory / f"{self.pyarchPrefix}_truncate-unique_XSCALE.LP"
         )
@@ -463,34 +490,12 @@ class AutoPROCTask(AbstractTask):
             self.resultsDirectory / f"{self.pyarchPrefix}_staraniso_alldata_XSCALE.LP"
         )
 
-
         autoProcAttachmentContainerList = []
         autoProcAttachmentContainerStaranisoList = []
 
-        for files in [
-            (autoPROCLogFile, autoPROCLogFile_resultsDir),
-            (autoPROCReportPdf, autoPROCReportPdf_resultsDir),
-            (autoPROCStaranisoReportPdf, autoPROCStaranisoReportPdf_resultsDir),
-            (
-                autoPROCStaranisoAllDataUniqueMtz,
-                autoPROCStaranisoAllDataUniqueMtz_resultsDir,
-            ),
-            (
-                autoPROCStaranisoAllDataUniqueStats,
-                autoPROCStaranisoAllDataUniqueStats_resultsDir,
-            ),
-            (
-                autoPROCStaranisoAllDataUniqueTable1,
-                autoPROCStaranisoAllDataUniqueTable1_resultsDir,
-            ),
-            (autoPROCSummaryInlinedHtml, autoPROCSummaryInlinedHtml_resultsDir),
-            (autoPROCSummaryTarGz, autoPROCSummaryTarGz_resultsDir),
-            (autoPROCTruncateUniqueMtz, autoPROCTruncateUniqueMtz_resultsDir),
-            (autoPROCTruncateUniqueStats, autoPROCTruncateUniqueStats_resultsDir),
-            (autoPROCTruncateUniqueTable1, autoPROCTruncateUniqueTable1_resultsDir),
-        ]:
-            UtilsPath.systemCopyFile(files[0], files[1])
+        UtilsPath.systemCopyFiles(listCopyFiles)
 
+        for files in listCopyFiles:
             pyarchFile = (
                 UtilsPath.createPyarchFilePath(files[1])
                 if self.doUploadIspyb
@@ -508,11 +513,7 @@ class AutoPROCTask(AbstractTask):
                 autoProcAttachmentContainerStaranisoList.append(attachmentContainer)
                 autoProcAttachmentContainerList.append(attachmentContainer)
 
-        for file in [
-            autoPROCStaranisoAllCifGz,
-            autoPROCTruncateAllCifGz,
-            autoPROCXdsAsciiHklGz,
-        ]:
+        for _, file in listGzipFiles:
             pyarchFile = (
                 UtilsPath.createPyarchFilePath(file) if self.doUploadIspyb else file
             )
@@ -580,13 +581,8 @@ class AutoPROCTask(AbstractTask):
             self.resultsDirectory / "autoPROC_staraniso.json"
         )
 
-        with open(autoProcContainerJson, "w") as fp:
-            json.dump(autoProcContainer, fp, indent=2, default=lambda o: str(o))
-
-        with open(autoProcContainerStaranisoJson, "w") as fp:
-            json.dump(
-                autoProcContainerStaraniso, fp, indent=2, default=lambda o: str(o)
-            )
+        UtilsJson.writeJson(autoProcContainerJson, autoProcContainer)
+        UtilsJson.writeJson(autoProcContainerStaranisoJson, autoProcContainerStaraniso)
 
         self.resultFilePaths = list(self.resultsDirectory.iterdir())
         if inData.get("test", False):
@@ -599,11 +595,8 @@ class AutoPROCTask(AbstractTask):
             self.pyarchDirectory = self.storeDataOnPyarch()
 
         if self.doUploadIspyb:
-            self.logToIspyb(
-                self.integrationId, "Indexing", "Successful", "AutoPROC finished"
-            )
-            self.logToIspyb(
-                self.integrationIdStaraniso,
+            self.logToIspybMulti(
+                [self.integrationId, self.integrationIdStaraniso],
                 "Indexing",
                 "Successful",
                 "AutoPROC finished",
@@ -612,12 +605,14 @@ class AutoPROCTask(AbstractTask):
             ispybStoreAutoProcResults = ISPyBStoreAutoProcResults(
                 inData=autoProcContainer, workingDirectorySuffix="uploadFinal"
             )
-            ispybStoreAutoProcResults.execute()
             ispybStoreAutoProcResultsStaraniso = ISPyBStoreAutoProcResults(
                 inData=autoProcContainerStaraniso,
                 workingDirectorySuffix="uploadFinal_staraniso",
             )
-            ispybStoreAutoProcResultsStaraniso.execute()
+            ispybStoreAutoProcResults.start()
+            ispybStoreAutoProcResultsStaraniso.start()
+            ispybStoreAutoProcResults.join()
+            ispybStoreAutoProcResultsStaraniso.join()
 
         outData = {
             "autoPROC": autoProcContainer,
@@ -695,80 +690,50 @@ class AutoPROCTask(AbstractTask):
         autoProcContainer["autoProcProgram"].pop("processingEnvironment")
         autoProcContainer["autoProcProgram"].pop("processingMessage")
 
-        timeStart = autoProcContainer["autoProcProgram"]["processingStartTime"]
-        timeEnd = autoProcContainer["autoProcProgram"]["processingEndTime"]
-        timeStart_structtime = time.strptime(timeStart, "%a %b %d %H:%M:%S %Z %Y")
-        timeEnd_structtime = time.strptime(timeEnd, "%a %b %d %H:%M:%S %Z %Y")
-        autoProcContainer["autoProcProgram"]["processingStartTime"] = time.strftime(
-            "%Y-%m-%dT%H:%M:%S", timeStart_structtime
-        )
-        autoProcContainer["autoProcProgram"]["processingEndTime"] = time.strftime(
-            "%Y-%m-%dT%H:%M:%S", timeEnd_structtime
-        )
+        for key in ["processingStartTime", "processingEndTime"]:
+            autoProcContainer["autoProcProgram"][key] = datetime.strptime(
+                autoProcContainer["autoProcProgram"][key], AUTOPROC_TIME_TEMPLATE
+            ).isoformat(timespec="seconds")
 
         autoProcContainer["autoProcProgram"]["autoProcProgramId"] = program_id
-        autoProcContainer["autoProc"] = autoProcXMLContainer["AutoProc"]
-        # fix some entries in autoProc
-        autoProcContainer["autoProc"]["refinedCellA"] = autoProcContainer[
-            "autoProc"
-        ].pop("refinedCell_a")
-        autoProcContainer["autoProc"]["refinedCellB"] = autoProcContainer[
-            "autoProc"
-        ].pop("refinedCell_b")
-        autoProcContainer["autoProc"]["refinedCellC"] = autoProcContainer[
-            "autoProc"
-        ].pop("refinedCell_c")
-        autoProcContainer["autoProc"]["refinedCellAlpha"] = autoProcContainer[
-            "autoProc"
-        ].pop("refinedCell_alpha")
-        autoProcContainer["autoProc"]["refinedCellBeta"] = autoProcContainer[
-            "autoProc"
-        ].pop("refinedCell_beta")
-        autoProcContainer["autoProc"]["refinedCellGamma"] = autoProcContainer[
-            "autoProc"
-        ].pop("refinedCell_gamma")
+        # should they be ints, floats, or strings? I don't know,
+        # but seems like they shouldn't be strings...
+        convertStrToIntOrFloat = AutoPROCTask.convertStrToIntOrFloat
+        autoProcContainer["autoProc"] = {
+            AUTOPROC_KEYS.get(k, k): convertStrToIntOrFloat(v)
+            for k, v in autoProcXMLContainer["AutoProc"].items()
+            if k != "wavelength"
+        }
         autoProcContainer["autoProc"]["autoProcProgramId"] = program_id
-        del autoProcContainer["autoProc"]["wavelength"]
-
-        autoProcContainer["autoProcScaling"] = autoProcXMLContainer[
-            "AutoProcScalingContainer"
-        ]["AutoProcScaling"]
-        autoProcContainer["autoProcScalingStatistics"] = autoProcXMLContainer[
-            "AutoProcScalingContainer"
-        ]["AutoProcScalingStatistics"]
-
-        autoProcContainer["autoProcIntegration"] = autoProcXMLContainer[
-            "AutoProcScalingContainer"
-        ]["AutoProcIntegrationContainer"]["AutoProcIntegration"]
+
+        autoProcScalingContainer = autoProcXMLContainer["AutoProcScalingContainer"]
+        autoProcContainer["autoProcScaling"] = {
+            k: convertStrToIntOrFloat(v)
+            for k, v in autoProcScalingContainer["AutoProcScaling"].items()
+        }
+        # rMeas, rPim, and rMerge need to be multiplied by 100
+        autoProcContainer["autoProcScalingStatistics"] = [
+            {
+                SCALING_STATISTICS_KEYS.get(k, k): (
+                    convertStrToIntOrFloat(v) * 100
+                    if k in PERCENT_STATISTICS_KEYS
+                    else convertStrToIntOrFloat(v)
+                )
+                for k, v in shell.items()
+            }
+            for shell in autoProcScalingContainer["AutoProcScalingStatistics"]
+        ]
+
+        autoProcContainer["autoProcIntegration"] = {
+            AUTOPROC_INTEGRATION_KEYS.get(k, k): convertStrToIntOrFloat(v)
+            for k, v in autoProcScalingContainer["AutoProcIntegrationContainer"][
+                "AutoProcIntegration"
+            ].items()
+        }
         autoProcContainer["autoProcIntegration"]["autoProcProgramId"] = program_id
         autoProcContainer["autoProcIntegration"][
             "autoProcIntegrationId"
         ] = integration_id
-        # fix some entries in AutoProcScalingIntegration
-        autoProcContainer["autoProcIntegration"]["cellA"] = autoProcContainer[
-            "autoProcIntegration"
-        ].pop("cell_a")
-        autoProcContainer["autoProcIntegration"]["cellB"] = autoProcContainer[
-            "autoProcIntegration"
-        ].pop("cell_b")
-        autoProcContainer["autoProcIntegration"]["cellC"] = autoProcContainer[
-            "autoProcIntegration"
-        ].pop("cell_c")
-        autoProcContainer["autoProcIntegration"]["cellAlpha"] = autoProcContainer[
-            "autoProcIntegration"
-        ].pop("cell_alpha")
-        autoProcContainer["autoProcIntegration"]["cellBeta"] = autoProcContainer[
-            "autoProcIntegration"
-        ].pop("cell_beta")
-        autoProcContainer["autoProcIntegration"]["cellGamma"] = autoProcContainer[
-            "autoProcIntegration"
-        ].pop("cell_gamma")
-        autoProcContainer["autoProcIntegration"]["refinedXbeam"] = autoProcContainer[
-            "autoProcIntegration"
-        ].pop("refinedXBeam")
-        autoProcContainer["autoProcIntegration"]["refinedYbeam"] = autoProcContainer[
-            "autoProcIntegration"
-        ].pop("refinedYBeam")
         autoProcContainer["autoProcIntegration"]["anomalous"] = anomalous
 
         autoProcScalingHasIntContainer = {
@@ -776,37 +741,6 @@ class AutoPROCTask(AbstractTask):
         }
         autoProcContainer["autoProcScalingHasInt"] = autoProcScalingHasIntContainer
 
-        for k, v in autoProcContainer["autoProc"].items():
-            autoProcContainer["autoProc"][k] = AutoPROCTask.convertStrToIntOrFloat(v)
-
-        for k, v in autoProcContainer["autoProcIntegration"].items():
-            autoProcContainer["autoProcIntegration"][
-                k
-            ] = AutoPROCTask.convertStrToIntOrFloat(v)
-
-        for k, v in autoProcContainer["autoProcScaling"].items():
-            autoProcContainer["autoProcScaling"][
-                k
-            ] = AutoPROCTask.convertStrToIntOrFloat(v)
-
-        for shell in autoProcContainer["autoProcScalingStatistics"]:
-            for k, v in shell.items():
-                # should they be ints, floats, or strings? I don't know,
-                # but seems like they shouldn't be strings...
-                shell[k] = AutoPROCTask.convertStrToIntOrFloat(v)
-
-                # rMeas, rPim, and rMerge need to be multiplied by 100
-                if any(x for x in ["rMerge", "rMeas", "rPim", "ccAno"] if x in k):
-                    shell[k] *= 100
-            shell["rmerge"] = shell.pop("rMerge")
-            shell["rmeasWithinIplusIminus"] = shell.pop("rMeasWithinIPlusIMinus")
-            shell["rmeasAllIplusIminus"] = shell.pop("rMeasAllIPlusIMinus")
-            shell["rpimWithinIplusIminus"] = shell.pop("rPimWithinIPlusIMinus")
-            shell["rpimAllIplusIminus"] = shell.pop("rPimAllIPlusIMinus")
-            shell["meanIoverSigI"] = shell.pop("meanIOverSigI")
-            shell["ccAno"] = shell.pop("ccAnomalous")
-            shell["sigAno"] = shell.pop("DanoOverSigDano")
-
         return autoProcContainer
 
     @staticmethod
@@ -815,15 +749,18 @@ class AutoPROCTask(AbstractTask):
         Tries to convert a string to an int first, then a float.
         If it doesn't work, returns the string.
         """
-        if isinstance(v, str):
-            try:
-                v = int(v)
-            except:
-                try:
-                    v = float(v)
-                except:
-                    pass
-        return v
+        if type(v) is not str:
+            return v
+        # plain unsigned integers, e.g. reflection counts, skip the regexes
+        if v.isdecimal():
+            return int(v)
+        # a single match classifies the string as int, float or neither
+        match = NUMBER_RE.fullmatch(v)
+        if match is None:
+            return v
+        if match.group("int") is not None:
+            return int(v)
+        return float(v)
 
     def eiger_template_to_master(self, fmt):
         if UtilsConfig.isMAXIV():
@@ -833,40 +770,52 @@ class AutoPROCTask(AbstractTask):
         return fmt_string
 
     def eiger_template_to_image(self, fmt, num):
-        import math
-
-        fileNumber = int(math.ceil(num / 100.0))
+        # ceiling division, 100 images per data file
+        fileNumber = int(-(-num // 100))
         if UtilsConfig.isMAXIV():
-            fmt_string = fmt.replace("%06d", "data_%06d" % fileNumber)
+            fmt_string = fmt.replace("%06d", f"data_{fileNumber:06d}")
         else:
-            fmt_string = fmt.replace("####", "1_data_%06d" % fileNumber)
+            fmt_string = fmt.replace("####", f"1_data_{fileNumber:06d}")
         return fmt_string.format(num)
 
     def logToIspyb(self, integrationId, step, status, comments=""):
-        # hack in the event we could not create an integration ID
-        if integrationId is None:
-            logger.error("could not log to ispyb: no integration id")
-            return
+        self.logToIspybMulti([integrationId], step, status, comments)
 
-        statusInput = {
-            "dataCollectionId": self.dataCollectionId,
-            "autoProcIntegration": {
-                "autoProcIntegrationId": integrationId,
-            },
-            "autoProcProgram": {},
-            "autoProcStatus": {
-                "autoProcIntegrationId": integrationId,
-                "step": step,
-                "status": status,
-                "comments": comments,
-                "bltimeStamp": datetime.now().isoformat(timespec="seconds"),
-            },
-        }
+    def logToIspybMulti(self, listIntegrationIds, step, status, comments=""):
+        """
+        Logs the same status for several integrations. The ISPyB tasks run
+        concurrently and share one time stamp.
+        """
+        bltimeStamp = datetime.now().isoformat(timespec="seconds")
+        listTasks = []
+        for integrationId in listIntegrationIds:
+            # hack in the event we could not create an integration ID
+            if integrationId is None:
+                logger.error("could not log to ispyb: no integration id")
+                continue
 
-        autoprocStatus = ISPyBStoreAutoProcStatus(
-            inData=statusInput, workingDirectorySuffix=""
-        )
-        autoprocStatus.execute()
+            statusInput = {
+                "dataCollectionId": self.dataCollectionId,
+                "autoProcIntegration": {
+                    "autoProcIntegrationId": integrationId,
+                },
+                "autoProcProgram": {},
+                "autoProcStatus": {
+                    "autoProcIntegrationId": integrationId,
+                    "step": step,
+                    "status": status,
+                    "comments": comments,
+                    "bltimeStamp": bltimeStamp,
+                },
+            }
+            listTasks.append(
+                ISPyBStoreAutoProcStatus(inData=statusInput, workingDirectorySuffix="")
+            )
+
+        for autoprocStatus in listTasks:
+            autoprocStatus.start()
+        for autoprocStatus in listTasks:
+            autoprocStatus.join()
 
     def createXSCALEOutputFromStats(self,statsFile, staraniso=False):
         with open(statsFile,'r') as fp:
@@ -955,13 +904,17 @@ class AutoPROCExecTask(AbstractTask):
         self.anomalous = inData.get("anomalous", False)
 
         # set up command line
-        self.autoPROCExecDir = self.getWorkingDirectory() / "AutoPROCExec_0"
-        inc_x = 1
-        while self.autoPROCExecDir.is_dir():
-            self.autoPROCExecDir = (
-                self.getWorkingDirectory() / "AutoPROCExec_{0}".format(inc_x)
+        listExecIndex = [
+            int(match.group(1))
+            for match in (
+                AUTOPROC_EXEC_DIR_RE.fullmatch(entry.name)
+                for entry in os.scandir(self.getWorkingDirectory())
+                if entry.is_dir()
             )
-            inc_x += 1
+            if match is not None
+        ]
+        inc_x = max(listExecIndex) + 1 if listExecIndex else 0
+        self.autoPROCExecDir = self.getWorkingDirectory() / f"AutoPROCExec_{inc_x}"
 
         outData["workingDirectory"] = str(self.autoPROCExecDir)
 
@@ -972,42 +925,43 @@ class AutoPROCExecTask(AbstractTask):
         maxNoProcessors = UtilsConfig.get("AutoPROCTask", "maxNoProcessors", None)
         autoPROCmacros = UtilsConfig.get("AutoPROCTask", "macros", None)
 
-        if autoPROCSetup is None:
-            commandLine = ""
-        else:
-            commandLine = ". " + autoPROCSetup + "\n"
-        commandLine += " {0}".format(autoPROCExecutable)
-        # add flags, if present
-        commandLine += " -B"
-        commandLine += " -d {0}".format(str(self.autoPROCExecDir))
-        commandLine += " -nthreads {0}".format(maxNoProcessors)
-
-        commandLine += " -h5 {0}".format(self.masterFilePath)
-        commandLine += " -ANO" if self.anomalous else ""
+        commandArgs = [
+            autoPROCExecutable,
+            # add flags, if present
+            "-B",
+            f"-d {self.autoPROCExecDir}",
+            f"-nthreads {maxNoProcessors}",
+            f"-h5 {self.masterFilePath}",
+        ]
+        if self.anomalous:
+            commandArgs.append("-ANO")
 
         if autoPROCmacros is not None:
-            for macro in autoPROCmacros.split():
-                commandLine += " -M {0}".format(macro)
+            commandArgs.extend(f"-M {macro}" for macro in autoPROCmacros.split())
 
         if self.spaceGroupString != "" and self.unitCell is not None:
-            commandLine += ' symm="{0}"'.format(self.spaceGroupString)
-            commandLine += ' cell="{cell_a} {cell_b} {cell_c} {cell_alpha} {cell_beta} {cell_gamma}"'.format(
-                **self.unitCell
+            commandArgs.append(f'symm="{self.spaceGroupString}"')
+            commandArgs.append(
+                'cell="{cell_a} {cell_b} {cell_c} {cell_alpha} {cell_beta} {cell_gamma}"'.format(
+                    **self.unitCell
+                )
             )
 
         if self.lowResLimit is not None or self.highResLimit is not None:
             low = self.lowResLimit if self.lowResLimit else 1000.0
             high = self.highResLimit if self.highResLimit else 0.1
-            commandLine += " -R {0} {1}".format(low, high)
-
-        config = UtilsConfig.getConfig()
-        config.optionxform = str
-        aP_config = config["AutoPROCTask"]
-        # logger.debug(f"{aP_config}")
-        for k, v in aP_config.items():
-            if k.startswith("autoPROC_"):
-                logger.info(f"autoPROC option: {k}={v}")
-                commandLine += " {0}={1}".format(k, v)
+            commandArgs.append(f"-R {low} {high}")
+
+        autoPROCOptions = getAutoPROCOptions(
+            UtilsConfig.getSite(), UtilsConfig.getConfigDir()
+        )
+        for k, v in autoPROCOptions:
+            logger.info(f"autoPROC option: {k}={v}")
+        commandArgs.extend(f"{k}={v}" for k, v in autoPROCOptions)
+
+        commandLine = " " + " ".join(commandArgs)
+        if autoPROCSetup is not None:
+            commandLine = ". " + autoPROCSetup + "\n" + commandLine
 
         logger.info("autoPROC command is {}".format(commandLine))
 
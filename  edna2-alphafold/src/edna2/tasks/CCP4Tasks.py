@@ -30,10 +30,12 @@ __date__ = "10/05/2019"
 
 import os
 import re
-from pathlib import Path
+import mmap
+import numpy as np
 
 from edna2.tasks.AbstractTask import AbstractTask
 
+from edna2.utils import UtilsPath
 from edna2.utils import UtilsConfig
 from edna2.utils import UtilsLogging
 import traceback
@@ -41,6 +43,66 @@ import subprocess
 
 logger = UtilsLogging.getLogger()
 
+# Labels of the aimless summary table, matched against the raw bytes of
+# the log, and the corresponding result keys
+AIMLESS_SUMMARY_FIELDS = {
+    b"Low resolution limit": ("resolutionLimitLow", float),
+    b"High resolution limit": ("resolutionLimitHigh", float),
+    b"Rmerge  (all I+ and I-)": ("rmerge", float),
+    b"Rmeas (within I+/I-)": ("rmeasWithinIplusIminus", float),
+    b"Rmeas (all I+ & I-)": ("rmeasAllIplusIminus", float),
+    b"Rpim (within I+/I-)": ("rpimWithinIplusIminus", float),
+    b"Rpim (all I+ & I-)": ("rpimAllIplusIminus", float),
+    b"Total number of observations": ("nTotalObservations", int),
+    b"Total number unique": ("nTotalUniqueObservations", int),
+    b"Mean((I)/sd(I))": ("meanIoverSigI", float),
+    b"Mn(I) half-set correlation CC(1/2)": ("ccHalf", float),
+    b"Completeness                   ": ("completeness", float),
+    b"Multiplicity                   ": ("multiplicity", float),
+    b"Anomalous completeness": ("anomalousCompleteness", float),
+    b"Anomalous multiplicity": ("anomalousMultiplicity", float),
+    b"DelAnom correlation between half-sets": ("ccAno", float),
+    b"Mid-Slope of Anom Normal Probability": ("sigAno", float),
+}
+# Anchored at line starts like the pointless regexes, one alternation
+# matches any summary label and the rest of its line
+AIMLESS_SUMMARY_BEGIN_RE = re.compile(
+    rb"^<!--SUMMARY_BEGIN--> \$TEXT:Result: \$\$ \$\$", re.MULTILINE
+)
+AIMLESS_SUMMARY_END_RE = re.compile(rb"^\$\$ <!--SUMMARY_END-->", re.MULTILINE)
+AIMLESS_SUMMARY_LINE_RE = re.compile(
+    rb"^(?P<label>" + b"|".join(map(re.escape, AIMLESS_SUMMARY_FIELDS)) + rb").*",
+    re.MULTILINE,
+)
+AIMLESS_SHELLS = ("overall", "innerShell", "outerShell")
+
+# aimless keyword input, rendered once per run into the listCommand lines
+AIMLESS_COMMAND_TEMPLATE = (
+    "bins 15\n"
+    "run 1 batch {start} to {end}\n"
+    "name run 1 project {project} crystal DEFAULT dataset NATIVE\n"
+    "scales constant\n"
+    "resolution 50 {resolution}\n"
+    "cycles 100\n"
+    "anomalous {anomalous}\n"
+    "output MERGED UNMERGED\n"
+    "END"
+)
+
+# Anchored at line starts so that a failed match is not retried at every
+# position of the log
+POINTLESS_SPACE_GROUP_RE = re.compile(
+    rb"^ +\* Space group = '(?P<sgstr>.*)' \(number\s+(?P<sgnumber>\d+)\)",
+    re.MULTILINE,
+)
+POINTLESS_LAUE_UNIT_CELL_RE = re.compile(
+    rb"^ {2,}Laue group confidence.+\n\n\s+Unit cell:(.+)", re.MULTILINE
+)
+POINTLESS_CELL_DIMENSIONS_RE = re.compile(
+    rb"^ +\* Cell Dimensions : \(obsolete \- refer to dataset cell dimensions above\)\n\n(.+)",
+    re.MULTILINE,
+)
+
 
 class AimlessTask(AbstractTask):
     """
@@ -70,31 +132,39 @@ class AimlessTask(AbstractTask):
         projectName = inData.get('dataCollectionID', 'EDNA_proc')
         resolution = inData.get('res', 0.0)
         anom = inData['anomalous']
-        listCommand = [
-            'bins 15',
-            'run 1 batch {0} to {1}'.format(start_image, end_image),
-            'name run 1 project {0} crystal DEFAULT dataset NATIVE'.format(projectName),
-            'scales constant',
-            'resolution 50 {0}'.format(resolution),
-            'cycles 100',
-            'anomalous {0}'.format('ON' if anom else 'OFF'),
-            'output MERGED UNMERGED',
-            'END'
-            ]
+        listCommand = AIMLESS_COMMAND_TEMPLATE.format(
+            start=start_image,
+            end=end_image,
+            project=projectName,
+            resolution=resolution,
+            anomalous='ON' if anom else 'OFF',
+        ).split('\n')
         self.setLogFileName('aimless.log')
         self.runCommandLine(commandLine, doSubmit=doSubmit, listCommand=listCommand)
-        outData['isSuccess'] = os.path.exists(output_file)
-
-        aimlessMergedMtz = self.getWorkingDirectory() / (output_file)
-        aimlessUnmergedMtz = self.getWorkingDirectory() / (output_file.replace('.mtz' , "_unmerged.mtz"))
-        aimlessLog = self.getWorkingDirectory() / self.getLogFileName()
-        #gzip the unmerged aimless.mtz file
         try:
-            logger.debug("gzip'ing aimless unmerged file {0}".format(str(aimlessUnmergedMtz)))
-            subprocess.call(['gzip', str(aimlessUnmergedMtz)])
-        except Exception:
-            logger.debug("gzip'ing the file failed: {0}".format(traceback.format_exc()))
-        aimlessUnmergedMtzGz = str(aimlessUnmergedMtz) + ".gz"
+            os.stat(output_file)
+            outData['isSuccess'] = True
+        except OSError:
+            outData['isSuccess'] = False
+
+        workingDirectory = self.getWorkingDirectory()
+        aimlessMergedMtz = workingDirectory / output_file
+        aimlessUnmergedMtz = workingDirectory / output_file.replace('.mtz' , "_unmerged.mtz")
+        aimlessLog = workingDirectory / self.getLogFileName()
+        aimlessUnmergedMtzGz = None
+        #gzip the unmerged aimless.mtz file, replacing it like gzip does
+        if outData['isSuccess'] and aimlessUnmergedMtz.exists():
+            try:
+                logger.debug("gzip'ing aimless unmerged file {0}".format(str(aimlessUnmergedMtz)))
+                UtilsPath.gzipFile(
+                    aimlessUnmergedMtz, str(aimlessUnmergedMtz) + ".gz", nproc=os.cpu_count()
+                )
+                os.unlink(aimlessUnmergedMtz)
+                aimlessUnmergedMtzGz = str(aimlessUnmergedMtz) + ".gz"
+            except Exception:
+                logger.debug("gzip'ing the file failed: {0}".format(traceback.format_exc()))
+        else:
+            logger.warning("No aimless unmerged file {0}".format(str(aimlessUnmergedMtz)))
         outData["aimlessMergedMtz"] = str(aimlessMergedMtz)
         outData["aimlessUnmergedMtz"] = aimlessUnmergedMtzGz
         outData["aimlessLog"] = aimlessLog
@@ -117,90 +187,60 @@ class AimlessTask(AbstractTask):
                 "AutoProcScalingStatisticsId" : None,
             },
         }
-        extract = []
         try:
-            with open(logfile,"r") as fp:
-                for line in fp:
-                    if line.startswith("<!--SUMMARY_BEGIN--> $TEXT:Result: $$ $$"):
-                        while not line.startswith("$$ <!--SUMMARY_END-->"):
-                            extract.append(line.strip('\n'))
-                            line = next(fp)
-                        break
+            # the log is searched in place as bytes, like the pointless log
+            with open(logfile, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as log:
+                summaryRows = AimlessTask.searchAimlessSummary(log)
+            AimlessTask.castAimlessSummary(summaryRows, aimlessResults)
         except:
             logger.error("aimless log file could not be parsed")
             return None
-        
-        lowResLimit = [x for x in extract if x.startswith("Low resolution limit")][0].split()[-3:]
-        aimlessResults["overall"]["resolutionLimitLow"] = float(lowResLimit[0])
-        aimlessResults["innerShell"]["resolutionLimitLow"] = float(lowResLimit[1])
-        aimlessResults["outerShell"]["resolutionLimitLow"] = float(lowResLimit[2])
-        hiResLimit = [x for x in extract if x.startswith("High resolution limit")][0].split()[-3:]
-        aimlessResults["overall"]["resolutionLimitHigh"] = float(hiResLimit[0])
-        aimlessResults["innerShell"]["resolutionLimitHigh"] = float(hiResLimit[1])
-        aimlessResults["outerShell"]["resolutionLimitHigh"] = float(hiResLimit[2])
-        rMerge = [x for x in extract if x.startswith("Rmerge  (all I+ and I-)")][0].split()[-3:]
-        aimlessResults["overall"]["rmerge"] = float(rMerge[0])
-        aimlessResults["innerShell"]["rmerge"] = float(rMerge[1])
-        aimlessResults["outerShell"]["rmerge"] = float(rMerge[2])
-        rmeasWithinIplusIminus = [x for x in extract if x.startswith("Rmeas (within I+/I-)")][0].split()[-3:]
-        aimlessResults["overall"]["rmeasWithinIplusIminus"] = float(rmeasWithinIplusIminus[0])
-        aimlessResults["innerShell"]["rmeasWithinIplusIminus"] = float(rmeasWithinIplusIminus[1])
-        aimlessResults["outerShell"]["rmeasWithinIplusIminus"] = float(rmeasWithinIplusIminus[2])
-        rmeasAllIplusIminus = [x for x in extract if x.startswith("Rmeas (all I+ & I-)")][0].split()[-3:]
-        aimlessResults["overall"]["rmeasAllIplusIminus"] = float(rmeasAllIplusIminus[0])
-        aimlessResults["innerShell"]["rmeasAllIplusIminus"] = float(rmeasAllIplusIminus[1])
-        aimlessResults["outerShell"]["rmeasAllIplusIminus"] = float(rmeasAllIplusIminus[2])
-        rpimWithinIplusIminus = [x for x in extract if x.startswith("Rpim (within I+/I-)")][0].split()[-3:]
-        aimlessResults["overall"]["rpimWithinIplusIminus"] = float(rpimWithinIplusIminus[0])
-        aimlessResults["innerShell"]["rpimWithinIplusIminus"] = float(rpimWithinIplusIminus[1])
-        aimlessResults["outerShell"]["rpimWithinIplusIminus"] = float(rpimWithinIplusIminus[2])
-        rpimAllIplusIminus = [x for x in extract if x.startswith("Rpim (all I+ & I-)")][0].split()[-3:]
-        aimlessResults["overall"]["rpimAllIplusIminus"] = float(rpimAllIplusIminus[0])
-        aimlessResults["innerShell"]["rpimAllIplusIminus"] = float(rpimAllIplusIminus[1])
-        aimlessResults["outerShell"]["rpimAllIplusIminus"] = float(rpimAllIplusIminus[2])
-        nTotalObservations = [x for x in extract if x.startswith("Total number of observations")][0].split()[-3:]
-        aimlessResults["overall"]["nTotalObservations"] = int(nTotalObservations[0])
-        aimlessResults["innerShell"]["nTotalObservations"] = int(nTotalObservations[1])
-        aimlessResults["outerShell"]["nTotalObservations"] = int(nTotalObservations[2])
-        nTotalUniqueObservations = [x for x in extract if x.startswith("Total number unique")][0].split()[-3:]
-        aimlessResults["overall"]["nTotalUniqueObservations"] = int(nTotalUniqueObservations[0])
-        aimlessResults["innerShell"]["nTotalUniqueObservations"] = int(nTotalUniqueObservations[1])
-        aimlessResults["outerShell"]["nTotalUniqueObservations"] = int(nTotalUniqueObservations[2])
-        meanIoverSigI = [x for x in extract if x.startswith("Mean((I)/sd(I))")][0].split()[-3:]
-        aimlessResults["overall"]["meanIoverSigI"] = float(meanIoverSigI[0])
-        aimlessResults["innerShell"]["meanIoverSigI"] = float(meanIoverSigI[1])
-        aimlessResults["outerShell"]["meanIoverSigI"] = float(meanIoverSigI[2])
-        ccHalf = [x for x in extract if x.startswith("Mn(I) half-set correlation CC(1/2)")][0].split()[-3:]
-        aimlessResults["overall"]["ccHalf"] = float(ccHalf[0])
-        aimlessResults["innerShell"]["ccHalf"] = float(ccHalf[1])
-        aimlessResults["outerShell"]["ccHalf"] = float(ccHalf[2])
-        completeness = [x for x in extract if x.startswith("Completeness                   ")][0].split()[-3:]
-        aimlessResults["overall"]["completeness"] = float(completeness[0])
-        aimlessResults["innerShell"]["completeness"] = float(completeness[1])
-        aimlessResults["outerShell"]["completeness"] = float(completeness[2])
-        multiplicity = [x for x in extract if x.startswith("Multiplicity                   ")][0].split()[-3:]
-        aimlessResults["overall"]["multiplicity"] = float(multiplicity[0])
-        aimlessResults["innerShell"]["multiplicity"] = float(multiplicity[1])
-        aimlessResults["outerShell"]["multiplicity"] = float(multiplicity[2])
-        anomalousCompleteness = [x for x in extract if x.startswith("Anomalous completeness")][0].split()[-3:]
-        aimlessResults["overall"]["anomalousCompleteness"] = float(anomalousCompleteness[0])
-        aimlessResults["innerShell"]["anomalousCompleteness"] = float(anomalousCompleteness[1])
-        aimlessResults["outerShell"]["anomalousCompleteness"] = float(anomalousCompleteness[2])
-        anomalousMultiplicity = [x for x in extract if x.startswith("Anomalous multiplicity")][0].split()[-3:]
-        aimlessResults["overall"]["anomalousMultiplicity"] = float(anomalousMultiplicity[0])
-        aimlessResults["innerShell"]["anomalousMultiplicity"] = float(anomalousMultiplicity[1])
-        aimlessResults["outerShell"]["anomalousMultiplicity"] = float(anomalousMultiplicity[2])
-        ccAno = [x for x in extract if x.startswith("DelAnom correlation between half-sets")][0].split()[-3:]
-        aimlessResults["overall"]["ccAno"] = float(ccAno[0])
-        aimlessResults["innerShell"]["ccAno"] = float(ccAno[1])
-        aimlessResults["outerShell"]["ccAno"] = float(ccAno[2])
-        sigAno = [x for x in extract if x.startswith("Mid-Slope of Anom Normal Probability")][0].split()[-3:]
-        aimlessResults["overall"]["sigAno"] = float(sigAno[0])
-        aimlessResults["innerShell"]["sigAno"] = None
-        aimlessResults["outerShell"]["sigAno"] = None
 
         return aimlessResults
 
+    @staticmethod
+    def searchAimlessSummary(log):
+        """
+        Returns the raw statistics of the aimless summary table as a dict of
+        key: [overall, innerShell, outerShell], only the first line with a
+        given label is used. Raises ValueError if the summary is missing.
+        """
+        begin = AIMLESS_SUMMARY_BEGIN_RE.search(log)
+        if begin is None:
+            raise ValueError("no aimless summary found")
+        end = AIMLESS_SUMMARY_END_RE.search(log, begin.end())
+        if end is None:
+            raise ValueError("aimless summary is not terminated")
+        summaryRows = {}
+        for match in AIMLESS_SUMMARY_LINE_RE.finditer(log, begin.start(), end.start()):
+            key = AIMLESS_SUMMARY_FIELDS[match.group("label")][0]
+            if key not in summaryRows:
+                summaryRows[key] = match.group(0).split()[-3:]
+        return summaryRows
+
+    @staticmethod
+    def castAimlessSummary(summaryRows, aimlessResults):
+        """
+        Converts the collected summary rows per shell into aimlessResults,
+        all rows of one type are cast in a single numpy call
+        """
+        converted = {}
+        if "sigAno" in summaryRows:
+            # only the overall anomalous slope is given
+            converted["sigAno"] = [float(summaryRows["sigAno"][0]), None, None]
+        for convert in (float, int):
+            keys = [key for key, fieldType in AIMLESS_SUMMARY_FIELDS.values()
+                    if fieldType is convert and key in summaryRows and key != "sigAno"]
+            if keys:
+                table = np.array([summaryRows[key] for key in keys], dtype=convert)
+                converted.update(zip(keys, table.tolist()))
+        # keep the order of the log in the results
+        for key in summaryRows:
+            for shell, value in zip(AIMLESS_SHELLS, converted[key]):
+                aimlessResults[shell][key] = value
+
 class PointlessTask(AbstractTask):
     """
     Executes the CCP4 program pointless
@@ -235,29 +275,26 @@ class PointlessTask(AbstractTask):
 
     @classmethod
     def parsePointlessOutput(cls, logPath):
-        sgre = re.compile(""" \* Space group = '(?P<sgstr>.*)' \(number\s+(?P<sgnumber>\d+)\)""")
         outData = {'isSuccess': False}
-        if logPath.exists():
-            with open(str(logPath)) as f:
-                log = f.read()
-            m = sgre.search(log)
-            if m is not None:
-                d = m.groupdict()
-                sgnumber = d['sgnumber']
-                sgstr = d['sgstr']
-
+        # a single stat for both the existence and the size check
+        try:
+            logSize = os.stat(logPath).st_size
+        except OSError:
+            logSize = 0
+        if logSize > 0:
+            # the log is searched in place as bytes, only the matched groups
+            # are decoded
+            with open(str(logPath), "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as log:
+                result = cls.searchPointlessLog(log)
+            if result is not None:
+                sgnumber, sgstr, unitCell = result
                 outData['sgnumber'] = int(sgnumber)
                 outData['sgstr'] = sgstr
                 outData['isSuccess'] = True
-                # Search first for unit cell after the Laue group...
-                unitCellRe = re.compile("""  Laue group confidence.+\\n\\n\s+Unit cell:(.+)""")
-                m2 = unitCellRe.search(log)
-                if m2 is None:
-                    # Then search it from the end...
-                    unitCellRe = re.compile(""" \* Cell Dimensions : \(obsolete \- refer to dataset cell dimensions above\)\\n\\n(.+)""")
-                    m2 = unitCellRe.search(log)
-                if m2 is not None:
-                    listCell = m2.groups()[0].split()
+                if unitCell is not None:
+                    listCell = unitCell.split()
                     cell = {
                         'length_a': float(listCell[0]),
                         'length_b': float(listCell[1]),
@@ -269,6 +306,32 @@ class PointlessTask(AbstractTask):
                     outData['cell'] = cell
         return outData
 
+    @staticmethod
+    def searchPointlessLog(log):
+        """
+        Returns (space group number, space group name, unit cell string)
+        found in the bytes of a pointless log, or None if there is no
+        space group. The unit cell string is None if no cell is found.
+        """
+        # cheap substring tests before running the regular expressions
+        m = None
+        if log.find(b"Space group =") != -1:
+            m = POINTLESS_SPACE_GROUP_RE.search(log)
+        if m is None:
+            return None
+        # Search first for unit cell after the Laue group...
+        m2 = None
+        if log.find(b"Unit cell:") != -1:
+            m2 = POINTLESS_LAUE_UNIT_CELL_RE.search(log)
+        if m2 is None and log.find(b"Cell Dimensions") != -1:
+            # Then search it from the end...
+            m2 = POINTLESS_CELL_DIMENSIONS_RE.search(log)
+        return (
+            m.group("sgnumber").decode(),
+            m.group("sgstr").decode(),
+            m2.group(1).decode() if m2 is not None else None,
+        )
+
     def gzipUnmergedPointlessFile(self):
         pointless_out = self.getWorkingDirectory() / self.output_file
         try:
@@ -302,8 +365,9 @@ class TruncateTask(AbstractTask):
         else:
             commandLine = ". " + ccp4setup + '\n'
 
+        workingDirectory = self.getWorkingDirectory()
         self.inputFile = inData['inputFile']
-        self.outputFile = self.getWorkingDirectory() / inData['outputFile']
+        self.outputFile = workingDirectory / inData['outputFile']
         commandLine += 'truncate '
         commandLine += 'hklin {0} hklout {1}'.format(self.inputFile, self.outputFile)
         listCommand = ['truncate YES']
@@ -318,18 +382,21 @@ class TruncateTask(AbstractTask):
         listCommand.append('end')
 
         self.setLogFileName('truncate.log')
+        outData["truncateLogPath"] = workingDirectory / self.getLogFileName()
         logger.debug("Running ccp4/truncate...")
         try:
             self.runCommandLine(commandLine, listCommand=listCommand)
         except:
             logger.error("Error running Truncate! Check the log file.")
-            outData["truncateLogPath"] = self.getWorkingDirectory() / self.getLogFileName()
             self.setFailure()
             return outData
 
         outData["truncateOutputMtz"] = self.outputFile
-        outData["truncateLogPath"] = self.getWorkingDirectory() / self.getLogFileName()
-        self.isSuccess = Path(self.outputFile).exists()
+        try:
+            os.stat(self.outputFile)
+            self.isSuccess = True
+        except OSError:
+            self.isSuccess = False
 
         return outData
     
@@ -360,7 +427,11 @@ class UniqueifyTask(AbstractTask):
             return outData
 
         outData["uniqueifyOutputMtz"] = self.outputFile
-        self.isSuccess = Path(self.outputFile).exists()
+        try:
+            os.stat(self.outputFile)
+            self.isSuccess = True
+        except OSError:
+            self.isSuccess = False
 
         return outData
     
@@ -385,19 +456,15 @@ class DimpleTask(AbstractTask):
 
         logPath = self.getWorkingDirectory() / 'dimple.log'
         self.runCommandLine(commandLine, logPath=logPath)
-        with open(str(logPath)) as f:
-            logText = f.read()
-        
         logger.info("Command line: {0}".format(commandLine))
 
         # outData = self.parseProcessPredictedModel(logPath)
         
-        if Path(f"{output_Dir}/final.pdb").exists() and Path(f"{output_Dir}/final.mtz").exists():
+        try:
+            os.stat(f"{output_Dir}/final.pdb")
+            os.stat(f"{output_Dir}/final.mtz")
             outData["isSuccess"] = True
+        except OSError:
+            pass
 
         return outData
-    
-    def parseDimpleLog(self, logPath):
-        if logPath.exists():
-            with open(str(logPath)) as f:
-                log = f.read()
\ No newline at end of file
@@ -602,7 +602,7 @@ class ControlDozor(AbstractTask):
                                 numpyArray = numpy.loadtxt(spotFile, skiprows=3)
                                 imageQualityIndicators[
                                     "dozorSpotList"
-                                ] = base64.b64encode(numpyArray.tostring()).decode(
+                                ] = base64.b64encode(numpyArray.tobytes()).decode(
                                     "utf-8"
                                 )
                                 imageQualityIndicators["dozorSpotListShape"] = list(
@@ -23,8 +23,8 @@ import json
 from builtins import RuntimeError
 
 import numpy
-import shlex
 # import distro
+import shlex
 import shutil
 import base64
 import pathlib
@@ -53,6 +53,18 @@ logger = UtilsLogging.getLogger()
 # Default parameters
 
 MAX_BATCH_SIZE = 5000
+# Column separators of the dozor log, replaced by blanks before splitting
+DOZOR_PIPE_TABLE = str.maketrans("|", " ")
+# Image quality indicators of all batches, one column per field
+IMAGE_QUALITY_INDICATORS_DTYPE = numpy.dtype([
+    ('number', numpy.int64),
+    ('angle', numpy.float64),
+    ('dozorScore', numpy.float64),
+    ('dozorSpotScore', numpy.float64),
+    ('dozorSpotsNumOf', numpy.int64),
+    ('dozorVisibleResolution', numpy.float64),
+    ('dozorSpotsResolution', numpy.float64),
+])
 
 
 class ExecPyDozor(AbstractTask):  # pylint: disable=too-many-instance-attributes
@@ -71,6 +83,7 @@ class ExecPyDozor(AbstractTask):  # pylint: disable=too-many-instance-attributes
                 "maskFile": {"type": "string"},                
                 "firstImageNumber": {"type": "integer"},
                 "lastImageNumber": {"type": "integer"},
+                "imageIndexOffset": {"type": "integer"},
                 "outputDirectory": {"type": "string"},
                 "numOfProcesses": {"type": "integer"},
                 "doSubmit": {"type" : "boolean"},
@@ -108,24 +121,29 @@ class ExecPyDozor(AbstractTask):  # pylint: disable=too-many-instance-attributes
         module_imports = UtilsConfig.get(self,'module_import',None)        
         cutoff = inData.get("dozorCutoff",5)
 
-        executable = module_imports + "\n\n"
-        executable += UtilsConfig.get(self, 'slurm_executable', 'dozor')
-        executable += " -s {} ".format(inData['firstImageNumber'])
-        executable += " -e {} ".format(inData['lastImageNumber'])                                
-        executable += " -m {} ".format(inData['masterFile'])                                
-        executable += " -o {} ".format(inData['outputDirectory'])
-        executable += " -n {} ".format(noProcesses)
-        executable += " -c {} ".format(cutoff)        
-        #Don't create individual spot lists to avoid spamming file system.
-        executable += " --skip_spots" 
+        # The arguments are quoted once when joined, e.g. for paths with blanks
+        listArgument = shlex.split(UtilsConfig.get(self, 'slurm_executable', 'dozor'))
+        listArgument += [
+            '-s', str(inData['firstImageNumber']),
+            '-e', str(inData['lastImageNumber']),
+            '-m', inData['masterFile'],
+            '-o', inData['outputDirectory'],
+            '-n', str(noProcesses),
+            '-c', str(cutoff),
+            #Don't create individual spot lists to avoid spamming file system.
+            '--skip_spots',
+        ]
+        if inData.get('maskFile',"") != "":
+            listArgument += ['-M', inData['maskFile']]
 
         if doSubmit:
             partition = UtilsConfig.get(self,'slurm_partition',None)
         else:
             partition = None
-        commandLine = executable 
-        if inData.get('maskFile',"") != "":
-            commandLine += " -M {} ".format(inData['maskFile'])
+        # The module imports are shell commands run before the executable
+        commandLine = shlex.join(listArgument)
+        if module_imports is not None:
+            commandLine = module_imports + "\n\n" + commandLine
         self.setLogFileName('pydozor.log')
         print("runCommandLine = \n{}\n".format(commandLine))
         if doSubmit:
@@ -133,7 +151,9 @@ class ExecPyDozor(AbstractTask):  # pylint: disable=too-many-instance-attributes
         else:
             self.runCommandLine(commandLine)
         #log = self.getLog()
-        with open(inData['outputDirectory']+"/dozor.log",'r') as dozorOut:
+        # dozor writes its table to the output directory, not to stdout, so
+        # the log is read back from disk, in 1 MiB blocks while parsing
+        with open(inData['outputDirectory']+"/dozor.log",'r', buffering=1 << 20) as dozorOut:
             outData = self.parseOutput(inData, dozorOut, workingDir=self.getWorkingDirectory())
         return outData
 
@@ -146,44 +166,89 @@ class ExecPyDozor(AbstractTask):  # pylint: disable=too-many-instance-attributes
         resultDozor = {
             'imageDozor': []  # list of dict. each dict contains spotFile and Image_path
         }
-        masterDict = ReadImageHeader.readHdf5Header(inData['masterFile'])
-        angle_start = masterDict['omega_start']
-        angle_step = round(masterDict['omega_range_average'],3)
-        counter = 0
-
-        for line in output:
-            # Remove '|'
-            listLine = shlex.split(line)
-            if len(listLine) > 0:
-                imageDozor = {}
-                try: 
-                    imageDozor['angle'] = angle_start + counter*angle_step
-                    imageDozor['image'] = str(listLine[0])
-                    imageDozor['number'] = int(listLine[1])
-                    imageDozor['spotsNumOf'] = int(listLine[2])
-                    imageDozor['spotsIntAver'] = 0 # TODO                
-                    imageDozor['spotScore'] = float(listLine[3])
-                    imageDozor['mainScore'] = float(listLine[3]) # TODO Difference compared to dozorSpotScore?
-                    imageDozor['visibleResolution'] = float(listLine[4])
-                    imageDozor['spotsResolution'] = float(listLine[4]) # TODO Difference compared to visibleResolution?
-                except Exception as e:
-                    logger.warning('Exception caught when parsing Dozor log!')
-                    logger.warning(e)
-                """ 
-                Spot files might be processed at this point, but for many images, a more intelligent storage strategy
-                is needed, in particular when we move to SSX datasets of the 10k order of magnitude. The dozor_offline
-                code should create a h5 file containing all spot data in a single file.
-                 
-                if workingDir is not None:
-                    spotFile = os.path.join(str(workingDir),
-                                            '%05d.spot' % imageDozor['number'])
-                    if os.path.exists(spotFile):
-                        imageDozor['spotFile'] = spotFile
-                """
-                resultDozor['imageDozor'].append(imageDozor)
-                counter += 1
+        # Remove '|' and split on whitespace while streaming the log
+        rows = [
+            listLine
+            for listLine in (line.translate(DOZOR_PIPE_TABLE).split() for line in output)
+            if len(listLine) > 0
+        ]
+        if len(rows) == 0:
+            # Failed run, no need to open the master file
+            return resultDozor
+        angle_start, omegaRangeAverage = ReadImageHeader.readHdf5Omega(inData['masterFile'])
+        angle_step = round(omegaRangeAverage,3)
+        # Index of the first image of this batch in the whole data collection
+        imageIndexOffset = inData.get('imageIndexOffset', 0)
+        angles = (
+            angle_start + (imageIndexOffset + numpy.arange(len(rows))) * angle_step
+        ).tolist()
+        """
+        Spot files might be processed at this point, but for many images, a more intelligent storage strategy
+        is needed, in particular when we move to SSX datasets of the 10k order of magnitude. The dozor_offline
+        code should create a h5 file containing all spot data in a single file.
+
+        if workingDir is not None:
+            spotFile = os.path.join(str(workingDir),
+                                    '%05d.spot' % imageDozor['number'])
+            if os.path.exists(spotFile):
+                imageDozor['spotFile'] = spotFile
+        """
+        try:
+            # Convert the numeric columns of all images at once
+            table = numpy.array([listLine[1:5] for listLine in rows])
+            numbers = table[:, 0].astype(int).tolist()
+            spotsNumOf = table[:, 1].astype(int).tolist()
+            scores = table[:, 2].astype(float).tolist()
+            resolutions = table[:, 3].astype(float).tolist()
+        except (ValueError, IndexError, OverflowError):
+            # Malformed lines, parse image by image
+            resultDozor['imageDozor'] = [
+                self.parseOutputLine(listLine, angle)
+                for listLine, angle in zip(rows, angles)
+            ]
+            return resultDozor
+        resultDozor['imageDozor'] = [
+            {
+                'angle': angle,
+                'image': str(listLine[0]),
+                'number': number,
+                'spotsNumOf': spots,
+                'spotsIntAver': 0, # TODO
+                'spotScore': score,
+                'mainScore': score, # TODO Difference compared to dozorSpotScore?
+                'visibleResolution': resolution,
+                'spotsResolution': resolution, # TODO Difference compared to visibleResolution?
+            }
+            for listLine, angle, number, spots, score, resolution in zip(
+                rows, angles, numbers, spotsNumOf, scores, resolutions
+            )
+        ]
         return resultDozor
 
+    @staticmethod
+    def parseOutputLine(listLine, angle):
+        """
+        Parses the columns of one image of the dozor output, keeping what
+        could be read from a malformed line
+        """
+        imageDozor = {}
+        try:
+            imageDozor['angle'] = angle
+            imageDozor['image'] = str(listLine[0])
+            imageDozor['number'] = int(listLine[1])
+            imageDozor['spotsNumOf'] = int(listLine[2])
+            imageDozor['spotsIntAver'] = 0 # TODO
+            score = float(listLine[3])
+            imageDozor['spotScore'] = score
+            imageDozor['mainScore'] = score # TODO Difference compared to dozorSpotScore?
+            resolution = float(listLine[4])
+            imageDozor['visibleResolution'] = resolution
+            imageDozor['spotsResolution'] = resolution # TODO Difference compared to visibleResolution?
+        except Exception as e:
+            logger.warning('Exception caught when parsing Dozor log!')
+            logger.warning(e)
+        return imageDozor
+
 
 class ControlPyDozor(AbstractTask):
 
@@ -264,9 +329,7 @@ class ControlPyDozor(AbstractTask):
         if overlap != 0:
             self.hasOverlap = True
         logger.debug("ExecPyDozor batch size: {0}".format(batchSize))
-        outData['imageQualityIndicators'] = []
-        #for listBatch in listAllBatches:
-        outDataDozor = self.runPyDozorTask(
+        listOutDataDozor = self.runPyDozorTask(
             inData=inData,
             batchSize=batchSize,
             overlap=overlap,
@@ -276,21 +339,15 @@ class ControlPyDozor(AbstractTask):
         #############################################################
         #Output will be much smaller for the dozor_offline script.
         ###########################################################
-        if outDataDozor is not None:
-            for imageDozor in outDataDozor['imageDozor']:
-                imageQualityIndicators = {
-                    'angle': imageDozor['angle'],
-                    'number': imageDozor['number'],
-                    'image': imageDozor['image'],
-                    'dozorScore': imageDozor['spotScore'],
-                    'dozorSpotScore': imageDozor['mainScore'],
-                    'dozorSpotsNumOf': imageDozor['spotsNumOf'],
-                    'dozorVisibleResolution': imageDozor['visibleResolution'],
-                    'dozorSpotsResolution': imageDozor['spotsResolution']
-                }
-                """ 
-                Spotfiles might be needed later in some form. Keeping this codeblock for now.
+        listImageDozor = []
+        for outDataDozor in listOutDataDozor:
+            if outDataDozor is None:
+                continue
+            listImageDozor += outDataDozor['imageDozor']
+            """ 
+            Spotfiles might be needed later in some form. Keeping this codeblock for now.
 
+            for imageDozor in outDataDozor['imageDozor']:
                 if 'spotFile' in imageDozor:
                     if os.path.exists(imageDozor['spotFile']):
                         spotFile = imageDozor['spotFile']
@@ -298,27 +355,35 @@ class ControlPyDozor(AbstractTask):
                         if returnSpotList:
                             numpyArray = numpy.loadtxt(spotFile, skiprows=3)
                             imageQualityIndicators['dozorSpotList'] = \
-                                base64.b64encode(numpyArray.tostring()).decode('utf-8')
+                                base64.b64encode(numpyArray.tobytes()).decode('utf-8')
                             imageQualityIndicators['dozorSpotListShape'] = \
                                 list(numpyArray.shape)
-                """
-                outData['imageQualityIndicators'].append(imageQualityIndicators)
+            """
             if doDozorm:
                 listDozorAllFile.append(outDataDozor['dozorAllFile'])
+        arrayImageQualityIndicators = self.createImageQualityIndicators(listImageDozor)
+        outData['imageQualityIndicators'] = self.imageQualityIndicatorsToList(
+            arrayImageQualityIndicators,
+            [imageDozor['image'] for imageDozor in listImageDozor],
+        )
         # Assemble all dozorAllFiles into one
         if doDozorm:
             controlDozorAllFile = str(self.getWorkingDirectory() / "dozor_all")
-            os.system('touch {0}'.format(controlDozorAllFile))
-            for dozorAllFile in listDozorAllFile:
-                command = 'cat ' + dozorAllFile + ' >> ' + controlDozorAllFile
-                os.system(command)
+            with open(controlDozorAllFile, 'ab') as fOut:
+                for dozorAllFile in listDozorAllFile:
+                    try:
+                        with open(dozorAllFile, 'rb') as fIn:
+                            shutil.copyfileobj(fIn, fOut, 1 << 20)
+                    except OSError as e:
+                        logger.warning("Couldn't append {0} to dozor_all".format(dozorAllFile))
+                        logger.warning(e)
         # Make plot if we have a data collection id
         if 'dataCollectionId' in inData:
             if "processDirectory" in inData:
                 processDirectory = pathlib.Path(inData["processDirectory"])
             else:
                 processDirectory = self.getWorkingDirectory()
-            dozorPlotPath, dozorCsvPath = self.makePlot(inData['dataCollectionId'], outData, self.getWorkingDirectory())
+            dozorPlotPath, dozorCsvPath = self.makePlot(inData['dataCollectionId'], arrayImageQualityIndicators, self.getWorkingDirectory())
             doIspybUpload = inData.get("doISPyBUpload", False)
             if doIspybUpload:
                 self.storeDataOnPyarch(inData["dataCollectionId"],
@@ -375,51 +440,127 @@ class ControlPyDozor(AbstractTask):
     def determineMaskfile(self, inData):
         return UtilsConfig.get('ControlPyDozor','mask_file') 
 
+    @classmethod
+    def createListOfBatches(cls, startNo, endNo, batchSize):
+        """
+        Splits the image range into (first, last) batches of at most batchSize
+        images. A negative endNo means the full range, run as one batch.
+        """
+        if endNo < 0 or not batchSize:
+            return [(startNo, endNo)]
+        batchSize = int(batchSize)
+        return [
+            (firstNo, min(firstNo + batchSize - 1, endNo))
+            for firstNo in range(startNo, endNo + 1, batchSize)
+        ]
+
     @classmethod
     def runPyDozorTask(cls, inData, batchSize, overlap, workingDirectory,
                      hasOverlap):
+        """
+        Runs one ExecPyDozor task per batch of images. The tasks are started
+        together, at most maxParallelBatches at a time, sharing the
+        ExecPyDozor cores, and their outData are returned in batch order,
+        None for failed batches.
+        """
         doSubmit = inData.get('doSubmit', False)
         doDozorm = inData.get('doDozorm', False)
         cutoff = inData.get('dozorCutoff',5)
         outputDozorDir = inData.get('dozorOutputDirectory',"output")
-        outDataDozor = None
-        inDataPyDozor = {'masterFile': inData['masterFile'],
-                'maskFile': inData['maskFile'],
-                'firstImageNumber': inData['startNo'],
-                'lastImageNumber': inData['endNo'],
-                'outputDirectory': outputDozorDir,
-                'numOfProcesses': int(UtilsConfig.get('ExecPyDozor','core',10)),
-                'doSubmit': doSubmit,
-                'doDozorm': doDozorm,
-                'dozorCutoff': cutoff
-                }
+        numOfProcesses = int(UtilsConfig.get('ExecPyDozor','core',10))
+        maxParallelBatches = int(UtilsConfig.get('ControlPyDozor', 'maxParallelBatches', 4))
         #Make sure dozor has existing directories to write to.
         outDirectory = pathlib.Path(workingDirectory) / outputDozorDir
         print("DEBUG: outDirectory = {}".format(outDirectory)) #ALEK DEBUG
         try:
-            if not outDirectory.exists():
-                outDirectory.mkdir(parents=True)
+            outDirectory.mkdir(parents=True, exist_ok=True)
         except Exception as e:
             logger.warning("Couldn't create dozor output dirs: {0}".format(outDirectory))
 
-        dozor = ExecPyDozor(inData=inDataPyDozor)
-        dozor.execute()
-        if not dozor.isFailure():
-            outDataDozor = dozor.outData
-        return outDataDozor
-
-    def makePlot(self, dataCollectionId, outDataImageDozor, workingDirectory):
-        minImageNumber = None
-        maxImageNumber = None
-        minAngle = None
-        maxAngle = None
-        minDozorValue = None
-        maxDozorValue = None
-        minResolution = None
-        maxResolution = None
-        plotFileName = 'dozor_{0}.png'.format(dataCollectionId)
-        csvFileName = 'dozor_{0}.csv'.format(dataCollectionId)
-        with open(str(workingDirectory / csvFileName), 'w') as gnuplotFile:
+        listBatches = cls.createListOfBatches(inData['startNo'], inData['endNo'], batchSize)
+        listOutDataDozor = []
+        for indexWave in range(0, len(listBatches), maxParallelBatches):
+            listWave = listBatches[indexWave:indexWave + maxParallelBatches]
+            # The configured dozor processes are shared by the batches of a wave
+            numOfProcessesBatch = max(1, numOfProcesses // len(listWave))
+            # Each task writes to the output directory in its own working directory
+            listDozor = [
+                ExecPyDozor(inData={
+                    'masterFile': inData['masterFile'],
+                    'maskFile': inData['maskFile'],
+                    'firstImageNumber': firstImageNumber,
+                    'lastImageNumber': lastImageNumber,
+                    'imageIndexOffset': firstImageNumber - inData['startNo'],
+                    'outputDirectory': outputDozorDir,
+                    'numOfProcesses': numOfProcessesBatch,
+                    'doSubmit': doSubmit,
+                    'doDozorm': doDozorm,
+                    'dozorCutoff': cutoff
+                })
+                for firstImageNumber, lastImageNumber in listWave
+            ]
+            for dozor in listDozor:
+                dozor.start()
+            for dozor in listDozor:
+                dozor.join()
+            for dozor, (firstImageNumber, lastImageNumber) in zip(listDozor, listWave):
+                if dozor.isFailure():
+                    logger.warning(
+                        "Dozor failed for images {0} to {1}, their results are missing".format(
+                            firstImageNumber, lastImageNumber))
+                    listOutDataDozor.append(None)
+                else:
+                    listOutDataDozor.append(dozor.outData)
+        return listOutDataDozor
+
+    @staticmethod
+    def createImageQualityIndicators(listImageDozor):
+        """
+        Collects the results of all images into one structured array with
+        IMAGE_QUALITY_INDICATORS_DTYPE, one column per indicator
+        """
+        return numpy.fromiter(
+            (
+                (
+                    imageDozor['number'],
+                    imageDozor['angle'],
+                    imageDozor['spotScore'],
+                    imageDozor['mainScore'],
+                    imageDozor['spotsNumOf'],
+                    imageDozor['visibleResolution'],
+                    imageDozor['spotsResolution'],
+                )
+                for imageDozor in listImageDozor
+            ),
+            dtype=IMAGE_QUALITY_INDICATORS_DTYPE,
+            count=len(listImageDozor),
+        )
+
+    @staticmethod
+    def imageQualityIndicatorsToList(arrayImageQualityIndicators, listImage):
+        """
+        Converts the structured array to the list of dicts of the
+        imageQualityIndicators output schema
+        """
+        names = arrayImageQualityIndicators.dtype.names
+        listImageQualityIndicators = []
+        for image, values in zip(listImage, arrayImageQualityIndicators.tolist()):
+            imageQualityIndicators = dict(zip(names, values))
+            imageQualityIndicators['image'] = image
+            listImageQualityIndicators.append(imageQualityIndicators)
+        return listImageQualityIndicators
+
+    def makePlot(self, dataCollectionId, arrayImageQualityIndicators, workingDirectory):
+        noRows = len(arrayImageQualityIndicators)
+        numbers = arrayImageQualityIndicators['number']
+        angles = arrayImageQualityIndicators['angle']
+        spotsNumOf = arrayImageQualityIndicators['dozorSpotsNumOf']
+        scores = arrayImageQualityIndicators['dozorScore']
+        spotScores = arrayImageQualityIndicators['dozorSpotScore']
+        resolutions = arrayImageQualityIndicators['dozorVisibleResolution']
+        dozorPlotPath = workingDirectory / 'dozor_{0}.png'.format(dataCollectionId)
+        dozorCsvPath = workingDirectory / 'dozor_{0}.csv'.format(dataCollectionId)
+        with open(str(dozorCsvPath), 'w') as gnuplotFile:
             gnuplotFile.write(
                 '# Data directory: {0}\n'.format(self.directory)
             )
@@ -433,40 +574,37 @@ class ControlPyDozor(AbstractTask):
                     "'Visible res.'",
                 )
             )
-            for imageQualityIndicators in outDataImageDozor['imageQualityIndicators']:
-               gnuplotFile.write(
-                   '{0:10d},{1:15.3f},{2:15d},{3:15.3f},{4:15.3f},{5:15.3f}\n'.format(
-                        imageQualityIndicators['number'],
-                        imageQualityIndicators['angle'],
-                        imageQualityIndicators['dozorSpotsNumOf'],
-                        10 * imageQualityIndicators['dozorScore'],
-                        imageQualityIndicators['dozorSpotScore'],
-                        imageQualityIndicators['dozorVisibleResolution'],
-                    )
-               )
-               if minImageNumber is None or minImageNumber > imageQualityIndicators['number']:
-                   minImageNumber = imageQualityIndicators['number']
-                   minAngle = imageQualityIndicators['angle']
-               if maxImageNumber is None or maxImageNumber < imageQualityIndicators['number']:
-                   maxImageNumber = imageQualityIndicators['number']
-                   maxAngle = imageQualityIndicators['angle']
-               if minDozorValue is None or minDozorValue > imageQualityIndicators['dozorScore']:
-                   minDozorValue = imageQualityIndicators['dozorScore']
-               if maxDozorValue is None or maxDozorValue < imageQualityIndicators['dozorScore']:
-                   maxDozorValue = imageQualityIndicators['dozorScore']
-
-               # Min resolution: the higher the value the lower the resolution
-               if minResolution is None or minResolution < imageQualityIndicators['dozorVisibleResolution']:
-                   # Disregard resolution worse than 10.0
-                   if imageQualityIndicators['dozorVisibleResolution'] < 10.0:
-                       minResolution = imageQualityIndicators['dozorVisibleResolution']
-
-               # Max resolution: the lower the number the better the resolution
-               if maxResolution is None or maxResolution > imageQualityIndicators['dozorVisibleResolution']:
-                   maxResolution = imageQualityIndicators['dozorVisibleResolution']
-
-
-        xtics = ''
+            # All rows are formatted into one string and written at once
+            table = numpy.column_stack(
+                (numbers, angles, spotsNumOf, 10 * scores, spotScores, resolutions)
+            )
+            gnuplotFile.write(
+                ('%10d,%15.3f,%15d,%15.3f,%15.3f,%15.3f\n' * noRows)
+                % tuple(table.ravel().tolist())
+            )
+
+        # The angles of the first lowest and highest image numbers
+        indexMin = numbers.argmin()
+        indexMax = numbers.argmax()
+        minImageNumber = numbers[indexMin].item()
+        maxImageNumber = numbers[indexMax].item()
+        minAngle = angles[indexMin].item()
+        maxAngle = angles[indexMax].item()
+        # The minimum score is never above the maximum one
+        maxDozorValue = scores.max().item()
+
+        # Min resolution: the higher the value the lower the resolution,
+        # disregard resolution worse than 10.0 (masked, without a copy)
+        minResolution = numpy.max(
+            resolutions, where=resolutions < 10.0, initial=-numpy.inf
+        ).item()
+        if minResolution == -numpy.inf:
+            minResolution = None
+
+        # Max resolution: the lower the number the better the resolution
+        maxResolution = resolutions.min().item()
+
+        smallNoImages = False
         if minImageNumber is not None and minImageNumber == maxImageNumber:
            minAngle -= 1.0
            maxAngle += 1.0
@@ -477,7 +615,7 @@ class ControlPyDozor(AbstractTask):
            deltaAngle = maxAngle - minAngle
            minAngle -= deltaAngle * 0.1 / noImages
            maxAngle += deltaAngle * 0.1 / noImages
-           xtics = '1'
+           smallNoImages = True
 
         if maxResolution is None or maxResolution > 0.8:
            maxResolution = 0.8
@@ -489,67 +627,63 @@ class ControlPyDozor(AbstractTask):
         else:
            minResolution = int(minResolution * 10.0) / 10.0 + 1
 
-        if maxDozorValue < 0.001 and minDozorValue < 0.001:
-           yscale = 'set yrange [-0.5:0.5]\n    set ytics 1'
-        else:
-           yscale = 'set autoscale  y'
-
-        gnuplotScript = \
-"""#
-set terminal png
-set output '{dozorPlotFileName}'
-set title '{title}' offset 0,1 font 'helvetica bold,8' noenhanced
-set grid x2 y2
-set xlabel "Image number"
-set x2label 'Angle (degrees)'
-set y2label 'Resolution (A)'
-set ylabel 'Number of spots / ExecDozor score (*10)'
-set xtics {xtics} nomirror
-set x2tics
-set ytics nomirror
-set y2tics
-set xrange [{minImageNumber}:{maxImageNumber}]
-set x2range [{minAngle}:{maxAngle}]
-{yscale}
-set y2range [{minResolution}:{maxResolution}]
-set key below font 'helvetica bold,10'
-plot '{dozorCsvFileName}' using 1:3 title 'Number of spots' axes x1y1 with points linetype rgb 'goldenrod' pointtype 7 pointsize 0.5, \
-    '{dozorCsvFileName}' using 1:4 title 'ExecDozor score' axes x1y1 with points linetype 3 pointtype 7 pointsize 0.5, \
-    '{dozorCsvFileName}' using 1:6 title 'Visible resolution' axes x1y2 with points linetype 1 pointtype 7 pointsize 0.5
-""".format(title=self.directory, #Change directory to masterfile or something better
-          dozorPlotFileName=plotFileName,
-          dozorCsvFileName=csvFileName,
-          minImageNumber=minImageNumber,
-          maxImageNumber=maxImageNumber,
-          minAngle=minAngle,
-          maxAngle=maxAngle,
-          minResolution=minResolution,
-          maxResolution=maxResolution,
-          xtics=xtics,
-          yscale=yscale,
-          )
-        pathGnuplotScript = str(workingDirectory / 'gnuplot.sh')
-        with open(pathGnuplotScript, 'w') as f:
-            f.write(gnuplotScript)
-        oldCwd = os.getcwd()
-        os.chdir(str(workingDirectory))
-        gnuplot = UtilsConfig.get(self, 'gnuplot', 'gnuplot')
-        os.system('{0} {1}'.format(gnuplot, pathGnuplotScript))
-        os.chdir(oldCwd)
-        dozorPlotPath = workingDirectory / plotFileName
-        dozorCsvPath = workingDirectory / csvFileName
+        # Same layout as the former gnuplot script: spots and score on the
+        # left axis, resolution on the right one and angles on the top one
+        fig, ax = plt.subplots(figsize=(6.4, 4.8))
+        ax.set_title(self.directory, fontsize=8, fontweight='bold', pad=24)
+        ax.set_xlabel('Image number')
+        ax.set_ylabel('Number of spots / ExecDozor score (*10)')
+        ax.set_xlim(minImageNumber, maxImageNumber)
+        if smallNoImages:
+            ax.xaxis.set_major_locator(matplotlib.ticker.MultipleLocator(1))
+        if maxDozorValue < 0.001:
+            ax.set_ylim(-0.5, 0.5)
+            ax.yaxis.set_major_locator(matplotlib.ticker.MultipleLocator(1))
+        markerSize = 4
+        plotSpots, = ax.plot(
+            numbers, spotsNumOf, 'o', color='goldenrod',
+            markersize=markerSize, label='Number of spots'
+        )
+        plotScore, = ax.plot(
+            numbers, 10 * scores, 'o', color='tab:blue',
+            markersize=markerSize, label='ExecDozor score'
+        )
+        axResolution = ax.twinx()
+        axResolution.set_ylabel('Resolution (A)')
+        axResolution.set_ylim(minResolution, maxResolution)
+        axResolution.grid(True)
+        plotResolution, = axResolution.plot(
+            numbers, resolutions, 'o', color='tab:red',
+            markersize=markerSize, label='Visible resolution'
+        )
+        axAngle = ax.twiny()
+        axAngle.set_xlabel('Angle (degrees)')
+        axAngle.set_xlim(minAngle, maxAngle)
+        axAngle.grid(True)
+        fig.legend(
+            handles=[plotSpots, plotScore, plotResolution],
+            loc='lower center',
+            ncol=3,
+            prop={'weight': 'bold', 'size': 10},
+            frameon=False,
+        )
+        fig.subplots_adjust(bottom=0.2, top=0.82)
+        fig.savefig(str(dozorPlotPath))
+        plt.close(fig)
         return dozorPlotPath, dozorCsvPath
 
     @classmethod
     def storeDataOnPyarch(cls, dataCollectionId,  dozorPlotPath, dozorCsvPath, workingDirectory):
         resultsDirectory = pathlib.Path(workingDirectory) / 'results'
+        dozorPlotResultPath = resultsDirectory / dozorPlotPath.name
+        dozorCsvResultPath = resultsDirectory / dozorCsvPath.name
+        listCopyFiles = []
         try:
-            if not resultsDirectory.exists():
-                resultsDirectory.mkdir(parents=True, mode=0o755)
-            dozorPlotResultPath = resultsDirectory / dozorPlotPath.name
-            dozorCsvResultPath = resultsDirectory / dozorCsvPath.name
-            shutil.copy(dozorPlotPath, dozorPlotResultPath)
-            shutil.copy(dozorCsvPath, dozorCsvResultPath)
+            resultsDirectory.mkdir(parents=True, mode=0o755, exist_ok=True)
+            listCopyFiles += [
+                (dozorPlotPath, dozorPlotResultPath),
+                (dozorCsvPath, dozorCsvResultPath),
+            ]
         except Exception as e:
             logger.warning(
                 "Couldn't copy files to results directory: {0}".format(
@@ -559,14 +693,24 @@ plot '{dozorCsvFileName}' using 1:3 title 'Number of spots' axes x1y1 with point
             # Create paths on pyarch
             dozorPlotPyarchPath = UtilsPath.createPyarchFilePath(dozorPlotResultPath)
             dozorCsvPyarchPath = UtilsPath.createPyarchFilePath(dozorCsvResultPath)
-            if not os.path.exists(os.path.dirname(dozorPlotPyarchPath)):
-                os.makedirs(os.path.dirname(dozorPlotPyarchPath), 0o755)
-            shutil.copy(dozorPlotResultPath, dozorPlotPyarchPath)
-            shutil.copy(dozorCsvResultPath, dozorCsvPyarchPath)
-            # Upload to data collection
-            dataCollectionId = UtilsIspyb.setImageQualityIndicatorsPlot(
-                dataCollectionId, dozorPlotPyarchPath, dozorCsvPyarchPath)
+            os.makedirs(os.path.dirname(dozorPlotPyarchPath), 0o755, exist_ok=True)
+            listCopyFiles += [
+                (dozorPlotPath, dozorPlotPyarchPath),
+                (dozorCsvPath, dozorCsvPyarchPath),
+            ]
         except Exception as e:
             logger.warning("Couldn't copy files to pyarch.")
             logger.warning(e)
+            dozorPlotPyarchPath = None
+        # The results and pyarch copies are independent, run them together.
+        # Only the data is needed, the kernel copies it with sendfile.
+        listCopied = UtilsPath.systemCopyFiles(listCopyFiles, copyMetadata=False)
+        if dozorPlotPyarchPath is not None and all(listCopied[-2:]):
+            try:
+                # Upload to data collection
+                dataCollectionId = UtilsIspyb.setImageQualityIndicatorsPlot(
+                    dataCollectionId, dozorPlotPyarchPath, dozorCsvPyarchPath)
+            except Exception as e:
+                logger.warning("Couldn't upload the dozor plot to ISPyB.")
+                logger.warning(e)
             
@@ -25,6 +25,7 @@ __date__ = "12/04/2021"
 
 import math
 import os
+import re
 import fabio
 import numpy
 import time
@@ -47,6 +48,9 @@ from edna2.utils import UtilsLogging
 
 logger = UtilsLogging.getLogger()
 
+# ESRF beamlines with an ExpectedFileSize entry in their site config
+BEAMLINE_RE = re.compile(r"id23eh1|id23eh2|id30a1|id30a2|id30a3|id30b")
+
 
 class DiffractionThumbnail(AbstractTask):
     """
@@ -200,11 +204,10 @@ class DiffractionThumbnail(AbstractTask):
     def getExpectedSize(self, imagePath):
         # Not great but works...
         expectedSize = 1000000
-        for beamline in ["id23eh1", "id23eh2", "id30a1", "id30a2", "id30a3", "id30b"]:
-            if beamline in imagePath:
-                taskConfig = UtilsConfig.getTaskConfig("ExpectedFileSize", "esrf_" + beamline)
-                expectedSize = int(taskConfig["image"])
-                break
+        match = BEAMLINE_RE.search(imagePath)
+        if match is not None:
+            taskConfig = UtilsConfig.getTaskConfig("ExpectedFileSize", "esrf_" + match.group())
+            expectedSize = int(taskConfig["image"])
         return expectedSize
 
     def copyThumbnailToPyarch(self, task):
@@ -25,13 +25,13 @@ __date__ = "20/01/2023"
 
 import os
 import math
+import contextlib
 import shutil
 import tempfile
 import traceback
 import numpy as np
 from pathlib import Path
 import re
-import h5py
 import socket
 import time
 from datetime import datetime
@@ -39,6 +39,20 @@ import json
 
 STRF_TEMPLATE = "%a %b %d %H:%M:%S %Y"
 
+# File template or master file name, e.g. "mx1234_1_master.h5" or
+# "lyso_x1_2_%06d.h5": the prefix, the run number and the last field
+FILE_TEMPLATE_RE = re.compile(r"^(?:(?P<head>.*)_)?(?P<prefix>[^_]*)_(?P<run>[^_]*)_[^_]*$")
+
+# aimless statistics which ISPyB stores as percentages
+ISPYB_PERCENTAGE_KEYS = (
+    "rmerge",
+    "ccAno",
+    "rmeasWithinIplusIminus",
+    "rmeasAllIplusIminus",
+    "rpimWithinIplusIminus",
+    "rpimAllIplusIminus",
+)
+
 # for the os.chmod
 from stat import *
 
@@ -97,7 +111,13 @@ class Edna2ProcTask(AbstractTask):
 
     # sets ISPyB to FAILED if it's already logged
     def setFailure(self):
+        # The error paths may call setFailure more than once, ISPyB is only
+        # set to failed the first time, with the time of the first failure
+        if self.isFailure():
+            return
         self._dictInOut["isFailure"] = True
+        self.endDateTime = datetime.now().isoformat(timespec="seconds")
+        self.flushIspybLogs()
         if self.doUploadIspyb:
             if self.integrationId is not None and self.programId is not None:
                 ISPyBStoreAutoProcResults.setIspybToFailed(
@@ -108,10 +128,33 @@ class Edna2ProcTask(AbstractTask):
                     processingPrograms=self.processingPrograms,
                     isAnom=self.anomalous,
                     timeStart=self.startDateTime,
-                    timeEnd=datetime.now().isoformat(timespec="seconds"),
+                    timeEnd=self.endDateTime,
                 )
 
     def run(self, inData):
+        # The ISPyB status logs are sent by ISPyBStoreAutoProcStatus tasks
+        # running while the processing goes on, see logToIspybImpl
+        self.ispybLogTasks = []
+        try:
+            return self.runProcessing(inData)
+        finally:
+            self.flushIspybLogs()
+
+    @contextlib.contextmanager
+    def timeStage(self, stage):
+        """
+        Adds the wall time spent in the with block to self.stageTimes[stage],
+        reruns of a stage add up
+        """
+        timeStart = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stageTimes[stage] = (
+                self.stageTimes.get(stage, 0.0) + time.perf_counter() - timeStart
+            )
+
+    def runProcessing(self, inData):
         UtilsLogging.addLocalFileHandler(
             logger, self.getWorkingDirectory() / "EDNA2Proc.log"
         )
@@ -122,6 +165,8 @@ class Edna2ProcTask(AbstractTask):
 
         self.tmpdir = None
         self.timeStart = time.perf_counter()
+        # Wall time of the XDS runs, see timeStage
+        self.stageTimes = {}
         self.startDateTime = datetime.now().isoformat(timespec="seconds")
         self.processingPrograms = "EDNA2_proc"
         self.processingCommandLine = ""
@@ -139,8 +184,11 @@ class Edna2ProcTask(AbstractTask):
         self.reintegrate = False
         outData = {}
         self.resultFilePaths = []
+        self.pyarchFilePaths = []
         self.pseudoTranslation = False
         self.twinning = False
+        # Included CORRECT.LP resolutions per XDS task, see getTaskResolutions
+        self.taskResolutions = {}
 
         try:
             logger.debug(f"System load avg: {os.getloadavg()}")
@@ -209,49 +257,32 @@ class Edna2ProcTask(AbstractTask):
         pathToStartImage = dataH5ImageList[0]
         pathToEndImage = dataH5ImageList[-1]
 
-        listPrefix = (
-            dataCollectionWS3VO.fileTemplate.split("_")
+        self.pyarchPrefix = self.getPyarchPrefix(
+            dataCollectionWS3VO.fileTemplate
             if dataCollectionWS3VO
-            else Path(self.masterFilePath).name.split("_")
+            else Path(self.masterFilePath).name
         )
 
-        # generate pyarch prefix
-        if UtilsConfig.isALBA():
-            self.pyarchPrefix = "ap_{0}_{1}".format(
-                "_".join(listPrefix[:-2]), listPrefix[-2]
-            )
-        elif UtilsConfig.isMAXIV():
-            self.pyarchPrefix = "ap_{0}_run{1}".format(listPrefix[-3], listPrefix[-2])
-        else:
-            if len(listPrefix) > 2:
-                self.pyarchPrefix = "ap_{0}_run{1}".format(
-                    listPrefix[-3], listPrefix[-2]
-                )
-            elif len(listPrefix) > 1:
-                self.pyarchPrefix = "ap_{0}_run{1}".format(
-                    listPrefix[:-2], listPrefix[-2]
-                )
-            else:
-                self.pyarchPrefix = "ap_{0}_run".format(listPrefix[0])
-
         if self.waitForFiles:
+            # Wait for the first and last images at the same time
             logger.info("Waiting for start image: {0}".format(pathToStartImage))
+            logger.info("Waiting for end image: {0}".format(pathToEndImage))
             waitFileFirst = WaitFileTask(
                 inData={"file": pathToStartImage, "expectedSize": 100000}
             )
-            waitFileFirst.execute()
+            waitFileLast = WaitFileTask(
+                inData={"file": pathToEndImage, "expectedSize": 100000}
+            )
+            waitFileFirst.start()
+            waitFileLast.start()
+            waitFileFirst.join()
+            waitFileLast.join()
             if waitFileFirst.outData["timedOut"]:
                 logger.warning(
                     "Timeout after {0:d} seconds waiting for the first image {1}!".format(
                         waitFileFirst.outData["timeOut"], pathToStartImage
                     )
                 )
-
-            logger.info("Waiting for end image: {0}".format(pathToEndImage))
-            waitFileLast = WaitFileTask(
-                inData={"file": pathToEndImage, "expectedSize": 100000}
-            )
-            waitFileLast.execute()
             if waitFileLast.outData["timedOut"]:
                 logger.warning(
                     "Timeout after {0:d} seconds waiting for the last image {1}!".format(
@@ -314,10 +345,8 @@ class Edna2ProcTask(AbstractTask):
         if self.doUploadIspyb:
             self.logToIspyb(self.integrationId, "Indexing", "Launched", "XDS started")
 
-        self.indexing.execute()
-
-        time1 = time.perf_counter()
-        self.timeXdsIndexing = time1 - self.timeStart
+        with self.timeStage("Indexing"):
+            self.indexing.execute()
 
         if self.indexing.isFailure() and self.unitCell is not None:
             logger.info(
@@ -331,10 +360,8 @@ class Edna2ProcTask(AbstractTask):
                 inData=self.xdsIndexingInDataRound2, workingDirectorySuffix="round2"
             )
             logger.info("Starting reindexing")
-            self.indexingRound2.execute()
-
-            time1 = time.perf_counter()
-            self.timeXdsIndexing = time1 - self.timeStart
+            with self.timeStage("Indexing"):
+                self.indexingRound2.execute()
 
             if self.indexingRound2.isFailure():
                 logger.error("Rerunning indexing failed. Exiting")
@@ -343,7 +370,7 @@ class Edna2ProcTask(AbstractTask):
                         self.integrationId,
                         "Indexing",
                         "Failed",
-                        "XDS failed after {0:.1f}s".format(self.timeXdsIndexing),
+                        "XDS failed after {0:.1f}s".format(self.stageTimes["Indexing"]),
                     )
                 self.setFailure()
                 return
@@ -356,7 +383,7 @@ class Edna2ProcTask(AbstractTask):
                     self.integrationId,
                     "Indexing",
                     "Failed",
-                    "XDS failed after {0:.1f}s".format(self.timeXdsIndexing),
+                    "XDS failed after {0:.1f}s".format(self.stageTimes["Indexing"]),
                 )
 
             self.setFailure()
@@ -367,9 +394,9 @@ class Edna2ProcTask(AbstractTask):
                     self.integrationId,
                     "Indexing",
                     "Successful",
-                    "XDS finished after {0:.1f}s".format(self.timeXdsIndexing),
+                    "XDS finished after {0:.1f}s".format(self.stageTimes["Indexing"]),
                 )
-            logger.info(f"XDS indexing time took {self.timeXdsIndexing:0.1f} seconds")
+            logger.info(f"XDS indexing time took {self.stageTimes['Indexing']:0.1f} seconds")
             logger.info(
                 "Indexing successful. a= {cell_a}, b= {cell_b}, c= {cell_c}, al = {cell_alpha}, be = {cell_beta}, ga = {cell_gamma}".format(
                     **self.indexing.outData["idxref"]["unitCell"]
@@ -391,18 +418,15 @@ class Edna2ProcTask(AbstractTask):
                 self.integrationId, "Integration", "Launched", "XDS started"
             )
 
-        self.integration.execute()
-
-        time2 = time.perf_counter()
-        self.timeXdsIntegration = time2 - time1
+        with self.timeStage("Integration"):
+            self.integration.execute()
 
         resCutoffFlag = False
         if self.integration.isSuccess():
             # calculate resolution cutoff. Reintegrate if no CC above 30%
-            completenessEntries = self.integration.outData.get(
-                "completenessEntries", None
+            firstResCutoff = self.getResCutoff(
+                self.getTaskResolutions(self.integration)
             )
-            firstResCutoff = self.getResCutoff(completenessEntries)
             if firstResCutoff is None:
                 resCutoffFlag = True
 
@@ -423,10 +447,8 @@ class Edna2ProcTask(AbstractTask):
                 workingDirectorySuffix="reInt_round2",
             )
             logger.info("Starting Reindexing")
-            self.indexingReintRound2.execute()
-
-            time1 = time.perf_counter()
-            self.timeXdsIndexing = time1 - self.timeStart
+            with self.timeStage("Indexing"):
+                self.indexingReintRound2.execute()
 
             if self.indexingReintRound2.isFailure():
                 logger.error("Rerunning indexing failed. Exiting")
@@ -435,7 +457,7 @@ class Edna2ProcTask(AbstractTask):
                         self.integrationId,
                         "Indexing",
                         "Failed",
-                        "XDS failed after {0:.1f}s".format(self.timeXdsIndexing),
+                        "XDS failed after {0:.1f}s".format(self.stageTimes["Indexing"]),
                     )
                 self.setFailure()
                 return
@@ -452,7 +474,8 @@ class Edna2ProcTask(AbstractTask):
             )
             logger.info("Starting Reintegration")
 
-            self.reintegration.execute()
+            with self.timeStage("Integration"):
+                self.reintegration.execute()
 
             if self.reintegration.isFailure():
                 logger.error("Error at integration step. Stopping.")
@@ -461,7 +484,7 @@ class Edna2ProcTask(AbstractTask):
                         self.integrationId,
                         "Integration",
                         "Failed",
-                        "XDS failed after {0:.1f}s".format(self.timeXdsIntegration),
+                        "XDS failed after {0:.1f}s".format(self.stageTimes["Integration"]),
                     )
                 self.setFailure()
                 return
@@ -475,7 +498,7 @@ class Edna2ProcTask(AbstractTask):
                     self.integrationId,
                     "Integration",
                     "Failed",
-                    "XDS failed after {0:.1f}s".format(self.timeXdsIntegration),
+                    "XDS failed after {0:.1f}s".format(self.stageTimes["Integration"]),
                 )
             self.setFailure()
             return
@@ -485,16 +508,18 @@ class Edna2ProcTask(AbstractTask):
                     self.integrationId,
                     "Integration",
                     "Successful",
-                    "XDS finished after {0:.1f}s".format(self.timeXdsIntegration),
+                    "XDS finished after {0:.1f}s".format(self.stageTimes["Integration"]),
                 )
             logger.info(
-                f"XDS integration time took {self.timeXdsIntegration:0.1f} seconds"
+                f"XDS integration time took {self.stageTimes['Integration']:0.1f} seconds"
             )
             logger.info("Integration Successful.")
 
         logger.info("Starting first resolution cutoff...")
         self.completenessEntries = self.integration.outData["completenessEntries"]
-        self.firstResCutoff = self.getResCutoff(self.completenessEntries)
+        self.firstResCutoff = self.getResCutoff(
+            self.getTaskResolutions(self.integration)
+        )
         if self.firstResCutoff is None:
             logger.error("No bins with CC1/2 greater than 30%")
             logger.error(
@@ -511,33 +536,8 @@ class Edna2ProcTask(AbstractTask):
             return
         logger.info(f"Resolution cutoff is {self.firstResCutoff}")
 
-        # copy the XDS.INP file from the successful run into the results directory.
-        xds_INP_result_path = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_successful_XDS.INP"
-        )
-        integrateLp_path = self.resultsDirectory / f"{self.pyarchPrefix}_INTEGRATE.LP"
-        correctLp_path = self.resultsDirectory / f"{self.pyarchPrefix}_CORRECT.LP"
-        integrateHkl_path = self.resultsDirectory / f"{self.pyarchPrefix}_INTEGRATE.HKL"
-        xdsAsciiHkl_path = self.resultsDirectory / f"{self.pyarchPrefix}_XDS_ASCII.HKL"
-        UtilsPath.systemCopyFile(
-            Path(self.integration.outData["integrateHkl"]), integrateHkl_path
-        )
-        UtilsPath.systemCopyFile(Path(self.integration.outData["xdsInp"]), xds_INP_result_path)
-        UtilsPath.systemCopyFile(Path(self.integration.outData["integrateLp"]), integrateLp_path)
-        UtilsPath.systemCopyFile(Path(self.integration.outData["correctLp"]), correctLp_path)
-        UtilsPath.systemCopyFile(Path(self.integration.outData["xdsAsciiHkl"]), xdsAsciiHkl_path)
-
-        self.resultFilePaths.extend(
-            [
-                xds_INP_result_path,
-                integrateLp_path,
-                correctLp_path,
-                integrateHkl_path,
-                xdsAsciiHkl_path,
-            ]
-        )
-
-        # run pointless
+        # run pointless, it only needs XDS_ASCII.HKL so the results are
+        # copied while it runs
         pointlessTaskinData = {
             "input_file": self.integration.outData["xdsAsciiHkl"],
             "output_file": "ep_pointless_unmerged.mtz",
@@ -546,7 +546,32 @@ class Edna2ProcTask(AbstractTask):
         self.pointlessTask = PointlessTask(
             inData=pointlessTaskinData, workingDirectorySuffix="init"
         )
-        self.pointlessTask.execute()
+        self.pointlessTask.start()
+
+        # copy the XDS.INP file from the successful run into the results directory.
+        # the XDS.INP path has to stay the first result file, see storeDataOnPyarch
+        integrationResultPaths = {
+            key: self.resultsDirectory / f"{self.pyarchPrefix}_{suffix}"
+            for key, suffix in [
+                ("xdsInp", "successful_XDS.INP"),
+                ("integrateLp", "INTEGRATE.LP"),
+                ("correctLp", "CORRECT.LP"),
+                ("integrateHkl", "INTEGRATE.HKL"),
+                ("xdsAsciiHkl", "XDS_ASCII.HKL"),
+            ]
+        }
+        UtilsPath.systemCopyFiles(
+            [
+                (self.integration.outData[key], resultPath)
+                for key, resultPath in integrationResultPaths.items()
+            ],
+            copyMetadata=False,
+            hardLink=True,
+        )
+
+        self.resultFilePaths.extend(integrationResultPaths.values())
+
+        self.pointlessTask.join()
 
         # logger.debug(f"Pointless output: {self.pointlessTask.outData}")
 
@@ -576,10 +601,8 @@ class Edna2ProcTask(AbstractTask):
             inData=rerunCor_data, workingDirectorySuffix="0"
         )
 
-        self.xdsRerun.execute()
-
-        time3 = time.perf_counter()
-        self.timeRerunCorrect = time3 - time2
+        with self.timeStage("RerunCorrect"):
+            self.xdsRerun.execute()
 
         if self.xdsRerun.isFailure():
             logger.error("Rerun of CORRECT failed")
@@ -589,7 +612,7 @@ class Edna2ProcTask(AbstractTask):
                     self.integrationId,
                     "Scaling",
                     "Failed",
-                    "Scaling failed after {0:.1}s".format(self.timeRerunCorrect),
+                    "Scaling failed after {0:.1f}s".format(self.stageTimes["RerunCorrect"]),
                 )
             return
         else:
@@ -599,13 +622,13 @@ class Edna2ProcTask(AbstractTask):
                     self.integrationId,
                     "Scaling",
                     "Successful",
-                    "Scaling finished in {0:.1f}s".format(self.timeRerunCorrect),
+                    "Scaling finished in {0:.1f}s".format(self.stageTimes["RerunCorrect"]),
                 )
 
         logger.info("Starting second resolution cutoff...")
         self.completenessEntries = self.xdsRerun.outData["completenessEntries"]
 
-        self.resCutoff = self.getResCutoff(self.completenessEntries)
+        self.resCutoff = self.getResCutoff(self.getTaskResolutions(self.xdsRerun))
         if self.resCutoff is None:
             logger.error("Error in determining resolution after CORRECT rerun.")
             logger.error("No bins with CC1/2 greater than 30%")
@@ -635,11 +658,7 @@ class Edna2ProcTask(AbstractTask):
                 "Resolution cutoffs finished",
             )
 
-        self.bins = [
-            x["res"]
-            for x in self.xdsRerun.outData["completenessEntries"]
-            if x["include_res_based_on_cc"] is True
-        ]
+        self.bins = self.getTaskResolutions(self.xdsRerun).tolist()
 
         self.pointlessTaskReruninData = {
             "input_file": self.xdsRerun.outData["xdsAsciiHkl"],
@@ -709,7 +728,8 @@ class Edna2ProcTask(AbstractTask):
                 inData=rerunCor_Anomdata, workingDirectorySuffix="anom"
             )
 
-            self.xdsRerunAnom.execute()
+            with self.timeStage("RerunCorrectAnom"):
+                self.xdsRerunAnom.execute()
 
             if self.xdsRerun.isFailure():
                 logger.error("Rerun of CORRECT failed")
@@ -719,7 +739,7 @@ class Edna2ProcTask(AbstractTask):
                         self.integrationId,
                         "Scaling",
                         "Failed",
-                        "Scaling failed after {0:.1}s".format(self.timeRerunCorrect),
+                        "Scaling failed after {0:.1f}s".format(self.stageTimes["RerunCorrectAnom"]),
                     )
                 return
             else:
@@ -729,13 +749,15 @@ class Edna2ProcTask(AbstractTask):
                         self.integrationId,
                         "Scaling",
                         "Successful",
-                        "Scaling finished in {0:.1f}s".format(self.timeRerunCorrect),
+                        "Scaling finished in {0:.1f}s".format(self.stageTimes["RerunCorrectAnom"]),
                     )
 
             logger.info("Starting third resolution cutoff...")
             self.completenessEntries = self.xdsRerun.outData["completenessEntries"]
 
-            self.resCutoff = self.getResCutoff(self.completenessEntries)
+            self.resCutoff = self.getResCutoff(
+                self.getTaskResolutions(self.xdsRerun)
+            )
             if self.resCutoff is None:
                 logger.error("Error in determining resolution after CORRECT rerun.")
                 logger.error("No bins with CC1/2 greater than 30%")
@@ -768,14 +790,10 @@ class Edna2ProcTask(AbstractTask):
                     "Resolution cutoffs finished",
                 )
 
-            self.bins = [
-                x["res"]
-                for x in self.xdsRerunAnom.outData["completenessEntries"]
-                if x["include_res_based_on_cc"] is True
-            ]
+            self.bins = self.getTaskResolutions(self.xdsRerunAnom).tolist()
 
             self.pointlessTaskRerunAnominData = {
-                "input_file": self.xdsRerun.outData["xdsAsciiHkl"],
+                "input_file": self.xdsRerunAnom.outData["xdsAsciiHkl"],
                 "output_file": "ep__pointless_unmerged.mtz",
             }
             logger.info("Starting pointless tasks...")
@@ -809,37 +827,8 @@ class Edna2ProcTask(AbstractTask):
             self.pointlessTaskRerun = self.pointlessTaskRerunAnom
             self.aimlessTask = self.aimlessTaskAnom
 
-        pointlessUnmergedMtzPath = self.resultsDirectory / (
-            f"{self.pyarchPrefix}_ep__pointless_unmerged.mtz"
-        )
-        self.resultFilePaths.append(pointlessUnmergedMtzPath)
-
-        UtilsPath.systemCopyFile(
-            Path(self.pointlessTaskRerun.outData["pointlessUnmergedMtz"]),
-            pointlessUnmergedMtzPath,
-        )
-
-        aimlessMergedMtzPath = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_aimless.mtz"
-        )
-        aimlessUnmergedMtzPath = (
-            self.resultsDirectory / f"{self.pyarchPrefix}_aimless_unmerged.mtz.gz"
-        )
-        aimlessLogPath = self.resultsDirectory / f"{self.pyarchPrefix}_aimless.log"
-
-        self.resultFilePaths.extend(
-            [aimlessMergedMtzPath, aimlessUnmergedMtzPath, aimlessLogPath]
-        )
-
-        UtilsPath.systemCopyFile(
-            Path(self.aimlessTask.outData["aimlessMergedMtz"]), aimlessMergedMtzPath
-        )
-        UtilsPath.systemCopyFile(
-            Path(self.aimlessTask.outData["aimlessUnmergedMtz"]),
-            aimlessUnmergedMtzPath,
-        )
-        UtilsPath.systemCopyFile(Path(self.aimlessTask.outData["aimlessLog"]), aimlessLogPath)
-
+        # XSCALE only needs the CORRECT output, it runs while the pointless
+        # and aimless results are copied
         self.timeXscaleStart = time.perf_counter()
         self.xscaleTaskData = {
             "xdsAsciiPath": self.xdsRerun.outData["xdsAsciiHkl"],
@@ -851,19 +840,48 @@ class Edna2ProcTask(AbstractTask):
             "res" : self.resCutoff
         }
         logger.info("Start XSCALE run...")
-        self.xscaleTaskData_merge = self.xscaleTaskData
-        self.xscaleTaskData_merge['merge'] = True
+        self.xscaleTaskData_merge = {**self.xscaleTaskData, "merge": True}
 
         self.xscaleTask_merge = XSCALETask(inData=self.xscaleTaskData_merge, workingDirectorySuffix="merged")
 
-        self.xscaleTaskData_unmerge = self.xscaleTaskData
-        self.xscaleTaskData_unmerge['merge'] = False
+        self.xscaleTaskData_unmerge = {**self.xscaleTaskData, "merge": False}
 
         self.xscaleTask_unmerge = XSCALETask(inData=self.xscaleTaskData_unmerge, workingDirectorySuffix="unmerged")
 
         self.xscaleTask_merge.start()
         self.xscaleTask_unmerge.start()
 
+        pointlessUnmergedMtzPath = self.resultsDirectory / (
+            f"{self.pyarchPrefix}_ep__pointless_unmerged.mtz"
+        )
+        self.resultFilePaths.append(pointlessUnmergedMtzPath)
+
+        aimlessMergedMtzPath = (
+            self.resultsDirectory / f"{self.pyarchPrefix}_aimless.mtz"
+        )
+        aimlessUnmergedMtzPath = (
+            self.resultsDirectory / f"{self.pyarchPrefix}_aimless_unmerged.mtz.gz"
+        )
+        aimlessLogPath = self.resultsDirectory / f"{self.pyarchPrefix}_aimless.log"
+
+        listCopies = [
+            (
+                self.pointlessTaskRerun.outData["pointlessUnmergedMtz"],
+                pointlessUnmergedMtzPath,
+            ),
+            (self.aimlessTask.outData["aimlessMergedMtz"], aimlessMergedMtzPath),
+            (self.aimlessTask.outData["aimlessLog"], aimlessLogPath),
+        ]
+        self.resultFilePaths.extend([aimlessMergedMtzPath, aimlessLogPath])
+        # aimless gives no unmerged file when it failed
+        if self.aimlessTask.outData.get("aimlessUnmergedMtz") is not None:
+            listCopies.append(
+                (self.aimlessTask.outData["aimlessUnmergedMtz"], aimlessUnmergedMtzPath)
+            )
+            self.resultFilePaths.append(aimlessUnmergedMtzPath)
+
+        UtilsPath.systemCopyFiles(listCopies, copyMetadata=False, hardLink=True)
+
         logger.info("Start phenix.xtriage run...")
         self.phenixXTriageTaskData = {
             "input_file": aimlessUnmergedMtzPath,
@@ -873,15 +891,13 @@ class Edna2ProcTask(AbstractTask):
         self.phenixXTriageTask.start()
 
         # now run truncate/unique
-        tempFile = tempfile.NamedTemporaryFile(
+        fd, truncateOut = tempfile.mkstemp(
             suffix=".mtz",
             prefix="tmp2-",
             dir=self.aimlessTask.getWorkingDirectory(),
-            delete=False,
         )
-        truncateOut = tempFile.name
-        tempFile.close()
-        os.chmod(truncateOut, S_IRUSR | S_IWUSR | S_IRGRP | S_IROTH)
+        os.fchmod(fd, S_IRUSR | S_IWUSR | S_IRGRP | S_IROTH)
+        os.close(fd)
         shutil.chown(truncateOut, group = self.getWorkingDirectory().group())
 
         logger.info("Start ccp4/truncate...")
@@ -912,8 +928,13 @@ class Edna2ProcTask(AbstractTask):
         xscaleTask_unmergeLPFile = self.resultsDirectory / "ap__unmerged_XSCALE.LP"
         self.resultFilePaths.extend([xscaleTask_mergeLPFile,
                                      xscaleTask_unmergeLPFile])
-        UtilsPath.systemCopyFile(self.xscaleTask_merge.outData["xscaleLp"], xscaleTask_mergeLPFile)
-        UtilsPath.systemCopyFile(self.xscaleTask_unmerge.outData["xscaleLp"], xscaleTask_unmergeLPFile)
+        UtilsPath.systemCopyFiles(
+            [
+                (self.xscaleTask_merge.outData["xscaleLp"], xscaleTask_mergeLPFile),
+                (self.xscaleTask_unmerge.outData["xscaleLp"], xscaleTask_unmergeLPFile),
+            ],
+            copyMetadata=False,
+        )
 
         self.phenixXTriageTask.join()
         self.uniqueify.join()
@@ -928,10 +949,13 @@ class Edna2ProcTask(AbstractTask):
             self.resultsDirectory / f"{self.pyarchPrefix}_phenix_xtriage_anom.mtz"
         )
 
-        UtilsPath.systemCopyFile(Path(self.truncate.outData["truncateLogPath"]), truncateLog)
-        UtilsPath.systemCopyFile(Path(self.uniqueify.outData["uniqueifyOutputMtz"]), uniqueMtz)
-        UtilsPath.systemCopyFile(
-            Path(self.phenixXTriageTask.outData["logPath"]), phenixXTriageTaskLog
+        UtilsPath.systemCopyFiles(
+            [
+                (self.truncate.outData["truncateLogPath"], truncateLog),
+                (self.uniqueify.outData["uniqueifyOutputMtz"], uniqueMtz),
+                (self.phenixXTriageTask.outData["logPath"], phenixXTriageTaskLog),
+            ],
+            copyMetadata=False,
         )
         if self.phenixXTriageTask.isSuccess():
             logger.info("Phenix.xtriage finished.")
@@ -964,17 +988,15 @@ class Edna2ProcTask(AbstractTask):
             isAnom=self.anomalous,
         )
 
-        # now send it to ISPyB
+        # now send it to ISPyB, the output data is assembled meanwhile
         if self.doUploadIspyb:
             logger.info("Sending data to ISPyB...")
+            # the step logs are sent before the final results
+            self.flushIspybLogs()
             self.ispybStoreAutoProcResults = ISPyBStoreAutoProcResults(
                 inData=self.autoProcResultsContainer, workingDirectorySuffix="final"
             )
-            self.ispybStoreAutoProcResults.execute()
-            if self.ispybStoreAutoProcResults.isFailure():
-                logger.error("ISPyB Store autoproc results failed.")
-                # self.setFailure()
-                # return
+            self.ispybStoreAutoProcResults.start()
             if self.phenixXTriageTask.isSuccess():
                 if self.phenixXTriageTask.outData.get("hasTwinning"):
                     self.twinning = True
@@ -987,6 +1009,13 @@ class Edna2ProcTask(AbstractTask):
         outData["twinning"] = self.twinning
         outData["pseudotranslation"] = self.pseudoTranslation
 
+        if self.doUploadIspyb:
+            self.ispybStoreAutoProcResults.join()
+            if self.ispybStoreAutoProcResults.isFailure():
+                logger.error("ISPyB Store autoproc results failed.")
+                # self.setFailure()
+                # return
+
         self.timeEnd = time.perf_counter()
         logger.info(f"Time to process was {self.timeEnd-self.timeStart:0.4f} seconds")
         if self.tmpdir is not None:
@@ -1005,28 +1034,32 @@ class Edna2ProcTask(AbstractTask):
             if not pyarchDirectory.exists():
                 pyarchDirectory.mkdir(parents=True, exist_ok=True, mode=0o755)
                 logger.debug(f"pyarchDirectory: {pyarchDirectory}")
-            for resultFile in [f for f in self.resultFilePaths if f.exists()]:
-                resultFilePyarchPath = UtilsPath.createPyarchFilePath(resultFile)
-                try:
-                    logger.info(f"Copying {resultFile} to pyarch directory")
-                    shutil.copy2(resultFile, resultFilePyarchPath)
-                except Exception as e:
-                    logger.warning(
-                        f"Couldn't copy file {resultFile} to results directory {pyarchDirectory}"
-                    )
-                    logger.warning(e)
+            listCopies = [
+                (resultFile, UtilsPath.createPyarchFilePath(resultFile))
+                for resultFile in self.resultFilePaths
+                if resultFile.exists()
+            ]
         else:
-            for resultFile in [f for f in self.resultFilePaths if f.exists()]:
-                try:
-                    logger.info(f"Copying {resultFile} to pyarch directory")
-                    resultFilePyarchPath = pyarchDirectory / Path(resultFile).name
-                    shutil.copy2(resultFile, resultFilePyarchPath)
-                except Exception as e:
-                    logger.warning(
-                        f"Couldn't copy file {resultFile} to results directory {pyarchDirectory}"
-                    )
-                    logger.warning(e)
-                
+            listCopies = [
+                (resultFile, pyarchDirectory / Path(resultFile).name)
+                for resultFile in self.resultFilePaths
+                if resultFile.exists()
+            ]
+        # The copies to the network file system are done concurrently, a
+        # failed copy is logged and doesn't stop the others
+        logger.info(f"Copying {len(listCopies)} files to pyarch directory")
+        listCopied = UtilsPath.systemCopyFiles(listCopies)
+        # The files on pyarch, so that the ISPyB attachments don't need a
+        # directory listing of the network file system
+        self.pyarchFilePaths = []
+        for (resultFile, resultFilePyarchPath), copied in zip(listCopies, listCopied):
+            if copied is None:
+                logger.warning(
+                    f"Couldn't copy file {resultFile} to results directory {pyarchDirectory}"
+                )
+            else:
+                self.pyarchFilePaths.append(resultFilePyarchPath)
+
         return pyarchDirectory
 
     def generateAutoProcScalingResultsContainer(self, programId, integrationId, isAnom):
@@ -1056,7 +1089,7 @@ class Edna2ProcTask(AbstractTask):
         autoProcResultsContainer["autoProc"] = autoProcContainer
 
         autoProcAttachmentContainerList = []
-        for file in self.pyarchDirectory.iterdir():
+        for file in self.pyarchFilePaths:
             attachmentContainer = {
                 "file": file,
             }
@@ -1110,19 +1143,17 @@ class Edna2ProcTask(AbstractTask):
         aimlessResults = self.aimlessTask.outData.get("aimlessResults")
 
         for shell, result in aimlessResults.items():
-            autoProcScalingStatisticsContainer = {}
-            autoProcScalingStatisticsContainer["scalingStatisticsType"] = shell
-            for k, v in result.items():
-                autoProcScalingStatisticsContainer[k] = v
+            autoProcScalingStatisticsContainer = {
+                "scalingStatisticsType": shell,
+                **result,
+            }
             if shell == "overall":
                 autoProcScalingStatisticsContainer["isa"] = xdsRerun.get("ISa", 0.0)
             # need to make a few adjustments for ISPyB...
-            autoProcScalingStatisticsContainer["rmerge"] *= 100
-            autoProcScalingStatisticsContainer["ccAno"] *= 100
-            autoProcScalingStatisticsContainer["rmeasWithinIplusIminus"] *= 100
-            autoProcScalingStatisticsContainer["rmeasAllIplusIminus"] *= 100
-            autoProcScalingStatisticsContainer["rpimWithinIplusIminus"] *= 100
-            autoProcScalingStatisticsContainer["rpimAllIplusIminus"] *= 100
+            for key in ISPYB_PERCENTAGE_KEYS:
+                value = autoProcScalingStatisticsContainer.get(key)
+                if value is not None:
+                    autoProcScalingStatisticsContainer[key] = value * 100
             autoProcScalingStatisticsContainerList.append(
                 autoProcScalingStatisticsContainer
             )
@@ -1137,11 +1168,11 @@ class Edna2ProcTask(AbstractTask):
     def generateImageListFromH5Master(inData):
         """Given an h5 master file, generate an image list for SubWedgeAssembly."""
         image_path = Path(inData["imagePath"])
-        m = re.search(r"\S+_\d{1,2}(?=_master.h5)", image_path.name)
+        m = UtilsImage.MASTER_FILE_STEM_RE.search(image_path.name)
         image_list_stem = m.group(0)
 
         image_list = []
-        master_file = h5py.File(inData["imagePath"], "r")
+        master_file = UtilsImage.openH5MasterFile(inData["imagePath"])
         for data_file in master_file["/entry/data"].keys():
             image_nr_high = int(
                 master_file["/entry/data"][data_file].attrs["image_nr_high"]
@@ -1160,49 +1191,104 @@ class Edna2ProcTask(AbstractTask):
     def generateImageListFromH5Master_fast(masterFilePath):
         """Given an h5 master file, generate an image list for SubWedgeAssembly."""
         masterFilePath = Path(masterFilePath)
-        m = re.search(r"\S+_\d{1,2}(?=_master.h5)", masterFilePath.name)
+        m = UtilsImage.MASTER_FILE_STEM_RE.search(masterFilePath.name)
         image_list_stem = m.group(0)
 
         image_list = []
-        with h5py.File(masterFilePath, "r") as master_file:
-            data_file_low = list(master_file["/entry/data"].keys())[0]
-            data_file_high = list(master_file["/entry/data"].keys())[-1]
-            image_nr_high = int(
-                master_file["/entry/data"][data_file_high].attrs["image_nr_high"]
-            )
-            image_nr_low = int(
-                master_file["/entry/data"][data_file_low].attrs["image_nr_low"]
-            )
+        with UtilsImage.openH5MasterFile(masterFilePath) as master_file:
+            # The link names are listed once and only the first and last
+            # linked data files are opened, for their image number range
+            data = master_file["/entry/data"]
+            list_data_file = list(data.keys())
+            image_nr_high = int(data[list_data_file[-1]].attrs["image_nr_high"])
+            image_nr_low = int(data[list_data_file[0]].attrs["image_nr_low"])
             image_list.append(
                 f"{str(masterFilePath.parent)}/{image_list_stem}_{image_nr_low:06}.h5"
             )
         return image_nr_low, image_nr_high, {"imagePath": image_list}
 
-    def getResCutoff(self, completeness_entries):
+    @staticmethod
+    def getPyarchPrefix(fileTemplate):
+        """
+        Generates the prefix of the result files from the file template
+        """
+        match = FILE_TEMPLATE_RE.match(fileTemplate)
+        if match is None:
+            # Less than three fields
+            return "ap_{0}_run".format(fileTemplate.rsplit("_", 1)[0])
+        if UtilsConfig.isALBA():
+            prefix = match.group("prefix")
+            if match.group("head") is not None:
+                prefix = match.group("head") + "_" + prefix
+            return "ap_{0}_{1}".format(prefix, match.group("run"))
+        return "ap_{0}_run{1}".format(match.group("prefix"), match.group("run"))
+
+    @staticmethod
+    def getIncludedResolutions(completeness_entries):
+        """
+        Returns the resolutions of the CORRECT.LP bins included based on
+        CC1/2 as a numpy array
+        """
+        entries = np.fromiter(
+            (
+                (x["res"], x["include_res_based_on_cc"])
+                for x in completeness_entries
+            ),
+            dtype=[("res", np.float64), ("include", np.bool_)],
+            count=len(completeness_entries),
+        )
+        return entries["res"][entries["include"]]
+
+    def getTaskResolutions(self, xdsTask):
+        """
+        Returns the included resolutions of an XDS task, None if it has no
+        completeness table. The table is only converted once per task.
+        """
+        if xdsTask not in self.taskResolutions:
+            completenessEntries = xdsTask.outData.get("completenessEntries")
+            includedResolutions = None
+            if completenessEntries is not None:
+                includedResolutions = self.getIncludedResolutions(
+                    completenessEntries
+                )
+            self.taskResolutions[xdsTask] = includedResolutions
+        return self.taskResolutions[xdsTask]
+
+    @staticmethod
+    def getResCutoff(includedResolutions):
         """
         get resolution cutoff based on CORRECT.LP
-        suggestion.
+        suggestion, from the resolutions returned by getTaskResolutions.
         """
-        if completeness_entries is None:
+        if includedResolutions is None or includedResolutions.size == 0:
             return None
-        return min(
-            [x["res"] for x in completeness_entries if x["include_res_based_on_cc"]],
-            default=None,
-        )
+        return includedResolutions.min().item()
+
+    def flushIspybLogs(self):
+        """
+        Waits until the started ISPyB status logs have been sent
+        """
+        ispybLogTasks = getattr(self, "ispybLogTasks", [])
+        for autoprocStatus in ispybLogTasks:
+            autoprocStatus.join()
+        ispybLogTasks.clear()
 
     # Proxy since the API changed and we can now log to several ids
     def logToIspyb(self, integrationId, step, status, comments=""):
+        # Sent in the background with the time stamp of the call, see
+        # flushIspybLogs
+        bltimeStamp = datetime.now().isoformat(timespec="seconds")
         if integrationId is not None:
             if type(integrationId) is list:
                 for item in integrationId:
-                    self.logToIspybImpl(item, step, status, comments)
+                    self.logToIspybImpl(item, step, status, comments, bltimeStamp)
             else:
-                self.logToIspybImpl(integrationId, step, status, comments)
+                self.logToIspybImpl(integrationId, step, status, comments, bltimeStamp)
                 # if status == "Failed":
                 #     for strErrorMessage in self.getListOfErrorMessages():
                 #         self.logToIspybImpl(integrationId, step, status, strErrorMessage)
 
-    def logToIspybImpl(self, integrationId, step, status, comments=""):
+    def logToIspybImpl(self, integrationId, step, status, comments="", bltimeStamp=None):
         # hack in the event we could not create an integration ID
         if integrationId is None:
             logger.error("could not log to ispyb: no integration id")
@@ -1219,14 +1305,25 @@ class Edna2ProcTask(AbstractTask):
                 "step": step,
                 "status": status,
                 "comments": comments,
-                "bltimeStamp": datetime.now().isoformat(timespec="seconds"),
+                "bltimeStamp": bltimeStamp
+                or datetime.now().isoformat(timespec="seconds"),
             },
         }
 
-        autoprocStatus = ISPyBStoreAutoProcStatus(
-            inData=statusInput, workingDirectorySuffix=""
-        )
-        autoprocStatus.execute()
+        # The status tasks run concurrently, each one gets its own working
+        # directory suffix. They are joined by flushIspybLogs.
+        ispybLogTasks = getattr(self, "ispybLogTasks", None)
+        if ispybLogTasks is None:
+            autoprocStatus = ISPyBStoreAutoProcStatus(
+                inData=statusInput, workingDirectorySuffix=""
+            )
+            autoprocStatus.execute()
+        else:
+            autoprocStatus = ISPyBStoreAutoProcStatus(
+                inData=statusInput, workingDirectorySuffix=str(len(ispybLogTasks))
+            )
+            autoprocStatus.start()
+            ispybLogTasks.append(autoprocStatus)
 
     def createIntegrationId(self, comments, isAnom=False):
         """
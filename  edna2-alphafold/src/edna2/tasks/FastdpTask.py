@@ -28,7 +28,6 @@ import tempfile
 import numpy as np
 from pathlib import Path
 import math
-import gzip
 import time
 import re
 import json
@@ -43,6 +42,7 @@ from stat import *
 from edna2.tasks.AbstractTask import AbstractTask
 
 from edna2.utils import UtilsPath
+from edna2.utils import UtilsJson
 from edna2.utils import UtilsConfig
 from edna2.utils import UtilsLogging
 from edna2.utils import UtilsIspyb
@@ -364,11 +364,11 @@ class FastdpTask(AbstractTask):
         pathToXdsAsciiHkl = self.fastDpResultFiles.get("xdsAsciiHkl")
         if pathToXdsAsciiHkl.exists():
             pyarchXdsAsciiHkl = self.pyarchPrefix + "_XDS_ASCII.HKL.gz"
-            with open(pathToXdsAsciiHkl, "rb") as f_in:
-                with gzip.open(
-                    os.path.join(self.resultsDirectory, pyarchXdsAsciiHkl), "wb"
-                ) as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+            UtilsPath.gzipFile(
+                pathToXdsAsciiHkl,
+                self.resultsDirectory / pyarchXdsAsciiHkl,
+                nproc=os.cpu_count(),
+            )
 
         # Add fast_dp.mtz if present and gzip it
         pathToFastDpMtz = self.fastDpResultFiles.get("fastDpMtz")
@@ -398,8 +398,9 @@ class FastdpTask(AbstractTask):
             self.programId, self.integrationId, isAnom=self.anomalous
         )
         if self.doUploadIspyb:
-            with open(self.resultsDirectory / "fast_dp_ispyb.json", "w") as fp:
-                json.dump(autoProcResults, fp, indent=2, default=lambda o: str(o))
+            UtilsJson.writeJson(
+                self.resultsDirectory / "fast_dp_ispyb.json", autoProcResults
+            )
             ispybStoreAutoProcResults = ISPyBStoreAutoProcResults(
                 inData=autoProcResults, workingDirectorySuffix="uploadFinal"
             )
@@ -730,69 +730,145 @@ class ISPyBStoreAutoProcResults(AbstractTask):
         return outData
     
     @staticmethod
-    def setIspybToRunning(dataCollectionId=None, processingCommandLine=None, processingPrograms=None, isAnom=False, timeStart=None):
-        inputStoreAutoProcAnom = {
+    def getAutoProcStatusInData(
+        dataCollectionId,
+        processingCommandLine,
+        processingPrograms,
+        processingStatus,
+        isAnom,
+        timeStart,
+        timeEnd=None,
+        autoProcProgramId=None,
+        autoProcIntegrationId=None,
+    ):
+        """
+        Returns the inData of an ISPyBStoreAutoProcResults run which only
+        sets the status of an autoProcProgram and its autoProcIntegration
+        """
+        return {
             "dataCollectionId": dataCollectionId,
-            "autoProcProgram":  {
+            "autoProcProgram": {
+                "autoProcProgramId": autoProcProgramId,
                 "processingCommandLine": processingCommandLine,
                 "processingPrograms": processingPrograms,
-                "processingStatus": "RUNNING",
+                "processingStatus": processingStatus,
                 "processingStartTime": timeStart,
-                },
-            "autoProcIntegration" : {
-                "anomalous":isAnom,
-            }
+                "processingEndTime": timeEnd,
+            },
+            "autoProcIntegration": {
+                "anomalous": isAnom,
+                "autoProcIntegrationId": autoProcIntegrationId,
+            },
         }
-        autoProcStoreIspybResults = ISPyBStoreAutoProcResults(inData=inputStoreAutoProcAnom, workingDirectorySuffix="setRunning")
-        autoProcStoreIspybResults.execute()
 
-        return autoProcStoreIspybResults.outData["autoProcIntegrationId"], autoProcStoreIspybResults.outData["autoProcProgramId"]
+    @staticmethod
+    def setIspybToRunning(dataCollectionId=None, processingCommandLine=None, processingPrograms=None, isAnom=False, timeStart=None):
+        return ISPyBStoreAutoProcResults.setIspybToRunningMulti(
+            dataCollectionId=dataCollectionId,
+            processingCommandLine=processingCommandLine,
+            listProcessingPrograms=[processingPrograms],
+            isAnom=isAnom,
+            timeStart=timeStart,
+        )[0]
+
+    @staticmethod
+    def setIspybToRunningMulti(dataCollectionId=None, processingCommandLine=None, listProcessingPrograms=None, isAnom=False, timeStart=None):
+        """
+        Same as setIspybToRunning for several processing programs at once,
+        the ISPyB requests are sent concurrently. Returns a list of
+        (autoProcIntegrationId, autoProcProgramId) in the order of
+        listProcessingPrograms.
+        """
+        listTasks = [
+            ISPyBStoreAutoProcResults(
+                inData=ISPyBStoreAutoProcResults.getAutoProcStatusInData(
+                    dataCollectionId,
+                    processingCommandLine,
+                    processingPrograms,
+                    "RUNNING",
+                    isAnom,
+                    timeStart,
+                ),
+                workingDirectorySuffix="setRunning",
+            )
+            for processingPrograms in listProcessingPrograms
+        ]
+        for autoProcStoreIspybResults in listTasks:
+            autoProcStoreIspybResults.start()
+        for autoProcStoreIspybResults in listTasks:
+            autoProcStoreIspybResults.join()
+
+        return [
+            (task.outData["autoProcIntegrationId"], task.outData["autoProcProgramId"])
+            for task in listTasks
+        ]
 
     @staticmethod
     def setIspybToFailed(dataCollectionId=None, autoProcProgramId=None, autoProcIntegrationId=None, processingCommandLine=None, processingPrograms=None, isAnom=False, timeStart=None, timeEnd=None):
-        inputStoreAutoProcAnom = {
-            "dataCollectionId": dataCollectionId,
-            "autoProcProgram":  {
-                "autoProcProgramId": autoProcProgramId,
-                "processingCommandLine": processingCommandLine,
-                "processingPrograms": processingPrograms,
-                "processingStatus": "FAILED",
-                "processingStartTime": timeStart,
-                "processingEndTime": timeEnd,
-                },
-            "autoProcIntegration" : {
-                "anomalous":isAnom,
-                "autoProcIntegrationId" : autoProcIntegrationId,
-            }
-        }
-        autoProcStoreIspybResults = ISPyBStoreAutoProcResults(inData=inputStoreAutoProcAnom, workingDirectorySuffix="setFailed")
-        autoProcStoreIspybResults.execute()
+        return ISPyBStoreAutoProcResults.setIspybToFailedMulti(
+            dataCollectionId=dataCollectionId,
+            listAutoProcIds=[(autoProcProgramId, autoProcIntegrationId)],
+            processingCommandLine=processingCommandLine,
+            processingPrograms=processingPrograms,
+            isAnom=isAnom,
+            timeStart=timeStart,
+            timeEnd=timeEnd,
+        )[0]
 
-        return autoProcStoreIspybResults.outData["autoProcIntegrationId"], autoProcStoreIspybResults.outData["autoProcProgramId"]
+    @staticmethod
+    def setIspybToFailedMulti(dataCollectionId=None, listAutoProcIds=None, processingCommandLine=None, processingPrograms=None, isAnom=False, timeStart=None, timeEnd=None):
+        """
+        Same as setIspybToFailed for several (autoProcProgramId,
+        autoProcIntegrationId) pairs at once, the ISPyB requests are sent
+        concurrently.
+        """
+        listTasks = [
+            ISPyBStoreAutoProcResults(
+                inData=ISPyBStoreAutoProcResults.getAutoProcStatusInData(
+                    dataCollectionId,
+                    processingCommandLine,
+                    processingPrograms,
+                    "FAILED",
+                    isAnom,
+                    timeStart,
+                    timeEnd=timeEnd,
+                    autoProcProgramId=autoProcProgramId,
+                    autoProcIntegrationId=autoProcIntegrationId,
+                ),
+                workingDirectorySuffix="setFailed",
+            )
+            for autoProcProgramId, autoProcIntegrationId in listAutoProcIds
+        ]
+        for autoProcStoreIspybResults in listTasks:
+            autoProcStoreIspybResults.start()
+        for autoProcStoreIspybResults in listTasks:
+            autoProcStoreIspybResults.join()
+
+        return [
+            (task.outData["autoProcIntegrationId"], task.outData["autoProcProgramId"])
+            for task in listTasks
+        ]
 
     @staticmethod
     def setIspybToTimeout(dataCollectionId=None, autoProcProgramId=None, autoProcIntegrationId=None, processingCommandLine=None, processingPrograms=None, isAnom=False, timeStart=None, timeEnd=None):
-        inputStoreAutoProcAnom = {
-            "dataCollectionId": dataCollectionId,
-            "autoProcProgram":  {
-                "autoProcProgramId": autoProcProgramId,
-                "processingCommandLine": processingCommandLine,
-                "processingPrograms": processingPrograms,
-                "processingStatus": "TIMEOUT",
-                "processingStartTime": timeStart,
-                "processingEndTime": timeEnd,
-                },
-            "autoProcIntegration" : {
-                "anomalous":isAnom,
-                "autoProcIntegrationId" : autoProcIntegrationId,
-            }
-        }
-        autoProcStoreIspybResults = ISPyBStoreAutoProcResults(inData=inputStoreAutoProcAnom, workingDirectorySuffix="setFailed")
+        autoProcStoreIspybResults = ISPyBStoreAutoProcResults(
+            inData=ISPyBStoreAutoProcResults.getAutoProcStatusInData(
+                dataCollectionId,
+                processingCommandLine,
+                processingPrograms,
+                "TIMEOUT",
+                isAnom,
+                timeStart,
+                timeEnd=timeEnd,
+                autoProcProgramId=autoProcProgramId,
+                autoProcIntegrationId=autoProcIntegrationId,
+            ),
+            workingDirectorySuffix="setFailed",
+        )
         autoProcStoreIspybResults.execute()
 
         return autoProcStoreIspybResults.outData["autoProcIntegrationId"], autoProcStoreIspybResults.outData["autoProcProgramId"]
 
-
 class ISPyBStoreAutoProcStatus(AbstractTask):
     def getOutDataSchema(self):
         return {
@@ -29,10 +29,18 @@ __date__ = "21/04/2019"
 #      EDPluginControlReadImageHeaderv10.py
 
 import os
+import re
 import h5py
-import numpy
 import time
 import pathlib
+import functools
+
+# Importing hdf5plugin registers the bitshuffle/LZ4 filters used by Eiger
+# data files with HDF5, once per process.
+try:
+    import hdf5plugin  # noqa F401
+except ImportError:
+    hdf5plugin = None
 
 from edna2.utils import UtilsLogging
 
@@ -69,6 +77,25 @@ DICT_SUFFIX_TO_IMAGE = {
     SUFFIX_Eiger16M: "Eiger16M",
 }
 
+# CBF header lines, matched on the raw bytes so that only the captured
+# groups need decoding, e.g. "# 2019/Apr/21 10:39:59.463" and
+# "# Wavelength 0.9677 A"
+CBF_DATE_RE = re.compile(rb"# (.{4}/.{3}/.*?)\r?\n?$")
+CBF_HEADER_ITEM_RE = re.compile(rb"# ([^ \r\n]*) ?(.*?)\r?\n?$")
+
+
+@functools.lru_cache(maxsize=16)
+def _readHdf5Omega(filePath, mtime):
+    # mtime is only part of the cache key, a rewritten file is read again
+    with UtilsImage.openH5MasterFile(filePath) as f:
+        goniometer = f["entry"]["sample"]["goniometer"]
+        omega = goniometer["omega"]
+        # 'Old' Eiger files have just one entry for 'omega', otherwise only
+        # the first element is read
+        omegaStart = float(omega[()] if omega.shape == () else omega[0])
+        omegaRangeAverage = goniometer["omega_range_average"][()]
+    return omegaStart, omegaRangeAverage
+
 
 class ReadImageHeader(AbstractTask):
 
@@ -112,21 +139,21 @@ class ReadImageHeader(AbstractTask):
             iMax = 60
             index = 0
             while doContinue:
-                line = f.readline().decode("utf-8")
+                line = f.readline()
                 index += 1
-                if "_array_data.header_contents" in line:
+                if b"_array_data.header_contents" in line:
                     dictHeader = {}
-                if "_array_data.data" in line or index > iMax:
+                if b"_array_data.data" in line or index > iMax:
                     doContinue = False
-                if dictHeader is not None and line[0] == "#":
+                if dictHeader is not None and line.startswith(b"#"):
                     # Check for date
-                    strTmp = line[2:].replace("\r\n", "")
-                    if line[6] == "/" and line[10] == "/":
-                        dictHeader["DateTime"] = strTmp
+                    matchDate = CBF_DATE_RE.match(line)
+                    if matchDate is not None:
+                        dictHeader["DateTime"] = matchDate.group(1).decode("utf-8")
                     else:
-                        strKey = strTmp.split(" ")[0]
-                        strValue = strTmp.replace(strKey, "")[1:]
-                        dictHeader[strKey] = strValue
+                        matchItem = CBF_HEADER_ITEM_RE.match(line)
+                        strKey = matchItem.group(1).decode("utf-8")
+                        dictHeader[strKey] = matchItem.group(2).decode("utf-8")
         return dictHeader
 
     @classmethod
@@ -228,7 +255,7 @@ class ReadImageHeader(AbstractTask):
         Returns an dictionary with the contents of an Eiger Hdf5 image header.
         """
         logger.info("Reading header from image " + str(filePath))
-        f = h5py.File(filePath, "r")
+        f = UtilsImage.openH5MasterFile(filePath)
         dictHeader = {
             "wavelength": f["entry"]["instrument"]["beam"]["incident_wavelength"][()],
             "beam_center_x": f["entry"]["instrument"]["detector"]["beam_center_x"][()],
@@ -258,15 +285,23 @@ class ReadImageHeader(AbstractTask):
             ]["data_collection_date"][()].decode("utf-8"),
             "data": list(f["entry"]["data"]),
         }
-        # 'Old' Eiger files have just one entry for 'omega'
-        omega = f["entry"]["sample"]["goniometer"]["omega"][()]
-        if type(omega) == numpy.float32:
-            dictHeader["omega_start"] = float(omega)
-        else:
-            dictHeader["omega_start"] = float(omega[0])
+        # 'Old' Eiger files have just one entry for 'omega', otherwise only
+        # the first element is read
+        omega = f["entry"]["sample"]["goniometer"]["omega"]
+        dictHeader["omega_start"] = float(omega[()] if omega.shape == () else omega[0])
         f.close()
         return dictHeader
 
+    @classmethod
+    def readHdf5Omega(cls, filePath):
+        """
+        Returns (omega_start, omega_range_average) of an Eiger Hdf5 master
+        file, reading only the goniometer datasets. The result is cached per
+        file.
+        """
+        filePath = str(filePath)
+        return _readHdf5Omega(filePath, os.stat(filePath).st_mtime_ns)
+
     @classmethod
     def createHdf5HeaderData(
         cls, imagePath, skipNumberOfImages=False, hasOverlap=False, isFastMesh=True,
@@ -36,11 +36,11 @@ import numpy as np
 from pathlib import Path
 import sys
 import re
-import h5py
 
 from edna2.tasks.AbstractTask import AbstractTask
 
 from edna2.utils import UtilsImage
+from edna2.utils import UtilsPath
 from edna2.utils import UtilsConfig
 from edna2.utils import UtilsLogging
 from edna2.utils import UtilsDetector
@@ -124,7 +124,7 @@ class XDSTask(AbstractTask):
             #         lowest_xds_image_number = UtilsImage.getImageNumber(image_path)
 
             # grab last image number from master file
-            with h5py.File(h5MasterFile, "r") as master_file:
+            with UtilsImage.openH5MasterFile(h5MasterFile) as master_file:
                 data_file = list(master_file["/entry/data"].keys())[0]
                 lowest_xds_image_number = int(
                     master_file["/entry/data"][data_file].attrs["image_nr_low"]
@@ -1298,23 +1298,27 @@ class XDSRerunCorrect(XDSTask):
             commandLine = ". " + xdsSetup + "\n"
         xdsExecutable = UtilsConfig.get(self, "xdsExecutable", "xds_par")
         commandLine += xdsExecutable
-        # Copy XPARM.XDS, GAIN.CBF file
-
-        for file in [
-            inData["xdsInp"],
-            inData["gainCbf"],
-            inData["xCorrectionsCbf"],
-            inData["yCorrectionsCbf"],
-            inData["blankCbf"],
-            inData["bkginitCbf"],
-            inData["integrateHkl"],
-        ]:
-            try:
-                shutil.copy(file, self.getWorkingDirectory())
-            except Exception as e:
-                logger.error(f"Error copying files to rerun CORRECT: {e}")
-                self.setFailure()
-                return
+        # Link or copy GAIN.CBF, INTEGRATE.HKL etc., CORRECT only reads them.
+        # XDS.INP is written by writeXDS_INP below so it must not be linked.
+        listCopied = UtilsPath.systemCopyFiles(
+            [
+                (file, self.getWorkingDirectory() / os.path.basename(file))
+                for file in [
+                    inData["gainCbf"],
+                    inData["xCorrectionsCbf"],
+                    inData["yCorrectionsCbf"],
+                    inData["blankCbf"],
+                    inData["bkginitCbf"],
+                    inData["integrateHkl"],
+                ]
+            ],
+            copyMetadata=False,
+            hardLink=True,
+        )
+        if None in listCopied:
+            logger.error("Error copying files to rerun CORRECT")
+            self.setFailure()
+            return
         # recycle GXPARM.XDS to XPARM.XDS, if it exists
         if inData.get("gxParmXds", None):
             try:
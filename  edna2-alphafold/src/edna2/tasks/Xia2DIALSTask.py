@@ -58,6 +58,17 @@ from edna2.tasks.WaitFileTask import WaitFileTask
 
 
 STRF_TEMPLATE = "%a %b %d %H:%M:%S %Y"
+# xia2 scaling statistics keys renamed to the ISPyB names,
+# as (new key, xia2 key, scale factor or None)
+SCALING_STATISTICS_RENAMES = (
+    ("rmerge", "rMerge", 100),
+    ("ccAno", "ccAnomalous", 100),
+    ("meanIoverSigI", "meanIOverSigI", None),
+    ("rmeasAllIplusIminus", "rMeasAllIPlusIMinus", 100),
+    ("rmeasWithinIplusIminus", "rMeasWithinIPlusIMinus", 100),
+    ("rpimWithinIplusIminus", "rPimWithinIPlusIMinus", 100),
+    ("rpimAllIplusIminus", "rPimAllIPlusIMinus", 100),
+)
 XSCALE_HEADER="""\
 ! This file is only for visualizing data in EXI and was generated by EDNA2.
  SUBSET OF INTENSITY DATA WITH SIGNAL/NOISE >= -3.0 AS FUNCTION OF RESOLUTION
@@ -554,13 +565,9 @@ class Xia2DIALSTask(AbstractTask):
             Isa = None
 
         for shell in autoProcContainer["autoProcScalingStatistics"]:
-            shell["rmerge"] = shell.pop("rMerge") * 100
-            shell["ccAno"] = shell.pop("ccAnomalous") * 100
-            shell["meanIoverSigI"] = shell.pop("meanIOverSigI")
-            shell["rmeasAllIplusIminus"] = shell.pop("rMeasAllIPlusIMinus") * 100
-            shell["rmeasWithinIplusIminus"] = shell.pop("rMeasWithinIPlusIMinus") * 100
-            shell["rpimWithinIplusIminus"] = shell.pop("rPimWithinIPlusIMinus") * 100
-            shell["rpimAllIplusIminus"] = shell.pop("rPimAllIPlusIMinus") * 100
+            for newKey, oldKey, scale in SCALING_STATISTICS_RENAMES:
+                value = shell.pop(oldKey)
+                shell[newKey] = value * scale if scale is not None else value
             if shell["scalingStatisticsType"] == "overall":
                 shell["isa"] = round(float(Isa), 2)
 
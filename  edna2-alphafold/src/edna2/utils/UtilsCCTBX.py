@@ -26,7 +26,6 @@ __date__ = "21/04/2019"
 import os
 import pathlib
 import configparser
-from cctbx.sgtbx import space_group_info
 
 from edna2.utils import UtilsLogging
 
@@ -38,6 +37,9 @@ def parseSpaceGroup(spaceGroup):
     if not spaceGroup:
         logger.info("No space group supplied")
         return 0, ""
+    # cctbx is slow to import, only load it when a space group is supplied
+    from cctbx.sgtbx import space_group_info
+
     try:
         spaceGroupInfo = space_group_info(spaceGroup).symbol_and_number()
         spaceGroupString = spaceGroupInfo.split("No. ")[0][:-2]
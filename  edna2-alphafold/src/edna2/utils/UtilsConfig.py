@@ -25,6 +25,7 @@ __date__ = "21/04/2019"
 
 import os
 import pathlib
+import functools
 import configparser
 
 
@@ -61,9 +62,11 @@ def setSite(site):
     os.environ["EDNA2_SITE"] = site
 
 
-def getConfig(site=None):
+def getConfig(site=None, caseSensitive=False):
     config = configparser.ConfigParser()
-    # config.optionxform = str
+    if caseSensitive:
+        # Must be set before reading, keys are lowercased while parsing
+        config.optionxform = str
     if site is None:
         site = getSite()
     configFile = site + ".ini"
@@ -75,19 +78,29 @@ def getConfig(site=None):
 
 
 def getTaskConfig(taskName, site=None):
+    if site is None:
+        site = getSite()
+    dictConfig = dict(_getRawTaskConfig(taskName, site, getConfigDir()))
+    # Substitute ${} from os.environ
+    for key in dictConfig:
+        dictConfig[key] = os.path.expandvars(dictConfig[key])
+    return dictConfig
+
+
+@functools.lru_cache(maxsize=None)
+def _getRawTaskConfig(taskName, site, configDir):
+    # The config files are parsed once per task, site and config directory.
+    # ${} are substituted by the callers so that os.environ is read each time.
     dictConfig = {}
     config = getConfig(site)
     sections = config.sections()
     # First search in included configs
     if "Include" in sections:
-        for site in config["Include"]:
-            dictConfig.update(getTaskConfig(taskName, site))
+        for includedSite in config["Include"]:
+            dictConfig.update(_getRawTaskConfig(taskName, includedSite, configDir))
     # Then update with the current config
     if taskName in sections:
         dictConfig.update(dict(config[taskName]))
-    # Substitute ${} from os.environ
-    for key in dictConfig:
-        dictConfig[key] = os.path.expandvars(dictConfig[key])
     return dictConfig
 
 
@@ -118,9 +131,11 @@ def isALBA():
 
 
 def get(task, parameterName, defaultValue=None):
-    if isinstance(task, str):
-        taskConfig = getTaskConfig(task)
-    else:
-        taskConfig = getTaskConfig(task.__class__.__name__)
-    value = taskConfig.get(parameterName.lower(), defaultValue)
-    return value
+    if not isinstance(task, str):
+        task = task.__class__.__name__
+    taskConfig = _getRawTaskConfig(task, getSite(), getConfigDir())
+    value = taskConfig.get(parameterName.lower())
+    if value is None:
+        return defaultValue
+    # Substitute ${} from os.environ
+    return os.path.expandvars(value)
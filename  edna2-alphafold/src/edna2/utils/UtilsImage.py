@@ -30,6 +30,7 @@ __date__ = "21/04/2019"
 import os
 import re
 import fabio
+import functools
 import pathlib
 import h5py
 from edna2.utils import UtilsConfig
@@ -37,14 +38,28 @@ from edna2.utils import UtilsLogging
 
 logger = UtilsLogging.getLogger()
 
+# Chunk cache of the Eiger master files: the goniometer and detector
+# datasets are read in a handful of chunk fetches instead of re-reading
+# chunks evicted from the default 1 MiB cache
+HDF5_MASTER_CHUNK_CACHE = {"rdcc_nbytes": 64 * 1024 * 1024, "rdcc_nslots": 521}
+
+# Image file names are matched per file by the template helpers, and the
+# Eiger master file name gives the stem of its linked data files
+IMAGE_TEMPLATE_RE = re.compile(r"(.*)([^0^1^2^3^4^5^6^7^8^9])([0-9]*)\.(.*)")
+MASTER_FILE_STEM_RE = re.compile(r"\S+_\d{1,2}(?=_master.h5)")
+
+
+def openH5MasterFile(masterFilePath):
+    """Opens an Eiger master file read-only with HDF5_MASTER_CHUNK_CACHE"""
+    return h5py.File(masterFilePath, "r", **HDF5_MASTER_CHUNK_CACHE)
+
 
 def __compileAndMatchRegexpTemplate(pathToImage):
     listResult = []
     if not isinstance(pathToImage, pathlib.Path):
         pathToImage = pathlib.Path(str(pathToImage))
     baseImageName = pathToImage.name
-    regexp = re.compile(r"(.*)([^0^1^2^3^4^5^6^7^8^9])([0-9]*)\.(.*)")
-    match = regexp.match(baseImageName)
+    match = IMAGE_TEMPLATE_RE.match(baseImageName)
     if match is not None:
         listResult = [
             match.group(0),
@@ -111,8 +126,17 @@ def splitPrefixRunNumber(path_to_image):
 
 
 def getH5FilePath(filePath, batchSize=100, hasOverlap=False, isFastMesh=False):
-    if type(filePath) == str:
-        filePath = pathlib.Path(filePath)
+    # The same image paths are resolved over and over again for every frame,
+    # so the result is cached. The site is part of the key since MAXIV uses
+    # a different file naming scheme.
+    return _getH5FilePath(
+        str(filePath), batchSize, hasOverlap, isFastMesh, UtilsConfig.isMAXIV()
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def _getH5FilePath(filePath, batchSize, hasOverlap, isFastMesh, isMAXIV):
+    filePath = pathlib.Path(filePath)
     imageNumber = getImageNumber(filePath)
     prefix = getPrefix(filePath)
     if hasOverlap or filePath.name.startswith("ref-"):
@@ -125,7 +149,7 @@ def getH5FilePath(filePath, batchSize=100, hasOverlap=False, isFastMesh=False):
     ):
         h5ImageNumber = int((imageNumber - 1) / 100) + 1
         h5FileNumber = 1
-    elif UtilsConfig.isMAXIV():
+    elif isMAXIV:
         h5FileNumber = prefix.split('_')[-1]
         prefix = '_'.join(prefix.split('_')[:-1])
         h5ImageNumber = int((imageNumber - 1) / batchSize) * batchSize + 1
@@ -216,7 +240,7 @@ def getNumberOfImages(masterFilePath):
     """Given an h5 master file, generate an image list for SubWedgeAssembly."""
     numImages = None
     masterFilePath = pathlib.Path(masterFilePath)
-    with h5py.File(masterFilePath,'r') as fp:
+    with openH5MasterFile(masterFilePath) as fp:
         depends_on = fp['/entry/sample/depends_on'][()].decode()
         numImages = len(fp[depends_on][()])
     return numImages
@@ -225,11 +249,11 @@ def getNumberOfImages(masterFilePath):
 def generateDataFileListFromH5Master(masterFilePath):
         """Given an h5 master file, generate an image list for SubWedgeAssembly."""
         masterFilePath = pathlib.Path(masterFilePath)
-        m = re.search(r"\S+_\d{1,2}(?=_master.h5)",masterFilePath.name)
+        m = MASTER_FILE_STEM_RE.search(masterFilePath.name)
         image_list_stem = m.group(0)
 
         image_list = []
-        with h5py.File(masterFilePath,'r') as master_file:
+        with openH5MasterFile(masterFilePath) as master_file:
             image_list = list(master_file['/entry/data'].keys())
         image_list = sorted(image_list)
         dataFileList = [masterFilePath.parent / f"{image_list_stem}_{x}.h5" for x in image_list]
@@ -241,11 +265,11 @@ def generateDataFileListFromH5Master(masterFilePath):
 def generateImageListFromH5Master_fast(masterFilePath):
     """Given an h5 master file, generate an image list for SubWedgeAssembly."""
     masterFilePath = pathlib.Path(masterFilePath)
-    m = re.search(r"\S+_\d{1,2}(?=_master.h5)",masterFilePath.name)
+    m = MASTER_FILE_STEM_RE.search(masterFilePath.name)
     image_list_stem = m.group(0)
 
     image_list = []
-    with h5py.File(masterFilePath,'r') as master_file:
+    with openH5MasterFile(masterFilePath) as master_file:
         data_file_low = list(master_file['/entry/data'].keys())[0]
         data_file_high = list(master_file['/entry/data'].keys())[-1]        
         image_nr_high = int(master_file['/entry/data'][data_file_high].attrs['image_nr_high'])
@@ -261,8 +285,8 @@ def eiger_template_to_master(fmt):
     return fmt_string
 
 def eiger_template_to_image(fmt, num):
-    import math
-    fileNumber = int(math.ceil(num / 100.0))
+    # ceiling division, 100 images per data file
+    fileNumber = int(-(-num // 100))
     if UtilsConfig.isMAXIV():
         fmt_string = fmt.replace("%06d", "data_%06d" % fileNumber)
     else:
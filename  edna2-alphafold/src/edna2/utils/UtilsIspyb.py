@@ -26,6 +26,7 @@ __date__ = "05/09/2019"
 import os
 import json
 import time
+import functools
 import requests
 from datetime import datetime
 from pathlib import Path
@@ -84,52 +85,42 @@ def getTransport():
     return transport
 
 
-def getCollectionWebService():
+@functools.lru_cache(maxsize=8)
+def _createWebServiceClient(wsdl, ispybUserName, ispybPassword):
+    # Downloading and parsing the WSDL is the expensive part, the client is
+    # created once per web service and credentials and then reused
+    transport = HttpAuthenticated(username=ispybUserName, password=ispybPassword)
+    return Client(wsdl, transport=transport, cache=None, location=wsdl)
+
+
+def getWebServiceClient(wsdl):
     logger = UtilsLogging.getLogger()
-    collectionWdsl = getToolsForCollectionWebService()
-    transport = getTransport()
-    if transport is None:
+    if getTransport() is None:
         logger.error(
             "No transport defined, ISPyB web service client cannot be instantiated."
         )
-        collectionWSClient = None
-    else:
-        collectionWSClient = Client(collectionWdsl, transport=transport, cache=None, location=collectionWdsl)
-    return collectionWSClient
+        return None
+    return _createWebServiceClient(
+        wsdl, os.environ["ISPyB_user"], os.environ["ISPyB_pass"]
+    )
+
+
+def getCollectionWebService():
+    return getWebServiceClient(getToolsForCollectionWebService())
 
 
 def getToolsForCollectionWebService():
     return os.path.join(getWdslRoot(), "ispybWS", "ToolsForCollectionWebService?wsdl")
 
 def getAutoprocessingWebService():
-    logger = UtilsLogging.getLogger()
-    collectionWdsl = getToolsForAutoprocessingWebService()
-    transport = getTransport()
-    if transport is None:
-        logger.error(
-            "No transport defined, ISPyB web service client cannot be instantiated."
-        )
-        collectionWSClient = None
-    else:
-        collectionWSClient = Client(collectionWdsl, transport=transport, cache=None, location=collectionWdsl)
-    return collectionWSClient
+    return getWebServiceClient(getToolsForAutoprocessingWebService())
 
 
 def getToolsForAutoprocessingWebService():
     return os.path.join(getWdslRoot(), "ispybWS", "ToolsForAutoprocessingWebService?wsdl")
 
 def getBLSampleWebService():
-    logger = UtilsLogging.getLogger()
-    collectionWdsl = getToolsForBLSampleWebService()
-    transport = getTransport()
-    if transport is None:
-        logger.error(
-            "No transport defined, ISPyB web service client cannot be instantiated."
-        )
-        collectionWSClient = None
-    else:
-        collectionWSClient = Client(collectionWdsl, transport=transport, cache=None, location=collectionWdsl)
-    return collectionWSClient
+    return getWebServiceClient(getToolsForBLSampleWebService())
 
 def getToolsForBLSampleWebService():
         return os.path.join(getWdslRoot(), "ispybWS", "ToolsForBLSampleWebService?wsdl")
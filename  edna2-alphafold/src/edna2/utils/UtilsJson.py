@@ -0,0 +1,49 @@
+#
+# Copyright (c) European Synchrotron Radiation Facility (ESRF)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__authors__ = ["D. Fastus"]
+__license__ = "MIT"
+__date__ = "16/10/2026"
+
+import json
+
+
+def dumps(data):
+    """
+    Returns data as a compact JSON string, objects which are not JSON
+    serializable (e.g. Path) are written as strings
+    """
+    return json.dumps(data, default=str)
+
+
+def loads(jsonString):
+    """Parses a JSON string written by dumps"""
+    return json.loads(jsonString)
+
+
+def writeJson(filePath, data):
+    """
+    Writes data as indented JSON to filePath, objects which are not JSON
+    serializable (e.g. Path, numpy scalars) are written as strings
+    """
+    with open(filePath, "w") as fp:
+        json.dump(data, fp, indent=2, default=str)
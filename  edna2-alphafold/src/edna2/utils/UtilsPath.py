@@ -28,6 +28,9 @@ __date__ = "21/04/2019"
 # mxv1/src/EDHandlerESRFPyarchv1_0.py
 
 import os
+import gzip
+import mmap
+import subprocess
 import time
 import pathlib
 import tempfile
@@ -35,6 +38,7 @@ import shutil
 import hashlib
 import string
 import random
+from concurrent.futures import ThreadPoolExecutor
 
 from edna2.utils import UtilsConfig
 from edna2.utils import UtilsLogging
@@ -201,6 +205,13 @@ def createPyarchFilePath(filePath):
     return pyarchFilePath
 
 
+def _statOrNone(file_path):
+    try:
+        return os.stat(file_path)
+    except FileNotFoundError:
+        return None
+
+
 def waitForFile(file, expectedSize=None, timeOut=DEFAULT_TIMEOUT):
     """Wait for the file to appear on disk."""
     file_path = pathlib.Path(file)
@@ -218,10 +229,11 @@ def waitForFile(file, expectedSize=None, timeOut=DEFAULT_TIMEOUT):
         stat_result = os.fstat(fd)
         os.close(fd)
         # logger.debug("Results of os.fstat: {0}".format(statResult))
-    # Check if file is there
-    if file_path.exists():
-        file_size = file_path.stat().st_size
-        file_mtime = file_path.stat().st_mtime
+    # Check if file is there, one stat call gives both size and mtime
+    file_stat = _statOrNone(file_path)
+    if file_stat is not None:
+        file_size = file_stat.st_size
+        file_mtime = file_stat.st_mtime
         time.sleep(0.1)
         # if expectedSize is not None:
         #     # Check size
@@ -252,9 +264,10 @@ def waitForFile(file, expectedSize=None, timeOut=DEFAULT_TIMEOUT):
                 logger.warning(str_warning)
             else:
                 # Check if file is there
-                if file_path.exists():
-                    file_size_new = file_path.stat().st_size
-                    file_mtime_new = file_path.stat().st_mtime
+                file_stat = _statOrNone(file_path)
+                if file_stat is not None:
+                    file_size_new = file_stat.st_size
+                    file_mtime_new = file_stat.st_mtime
                     if expectedSize is not None:
                         # Check that it has right size
                         if (
@@ -268,7 +281,7 @@ def waitForFile(file, expectedSize=None, timeOut=DEFAULT_TIMEOUT):
                             should_continue = False
                     final_size = file_size
                     file_size = file_size_new
-                    file_mtime == file_mtime_new
+                    file_mtime = file_mtime_new
             if should_continue:
                 # Sleep 1 s
                 time.sleep(1)
@@ -301,12 +314,91 @@ def stripDataDirectoryPrefix(data_directory):
     return pathlib.Path(new_data_directory)
 
 
-def systemCopyFile(fp_in, fp_out):
-    """Uses shutil.copy2 to copy files."""
+def systemCopyFile(fp_in, fp_out, copyMetadata=True, hardLink=False):
+    """
+    Uses shutil.copy2 to copy files. On Linux the data is copied in the
+    kernel with os.sendfile. With copyMetadata=False only the data is
+    copied (shutil.copyfile), which saves the stat/chmod/utime calls of
+    copy2 on network file systems. With hardLink=True fp_out is first
+    tried as a hard link to fp_in, which costs no data copy at all when
+    both are on the same file system, and copied otherwise.
+    """
+    if hardLink:
+        try:
+            os.link(fp_in, fp_out)
+            logger.debug(f"Linked {fp_in} to {fp_out}")
+            return fp_out
+        except OSError:
+            pass
     try:
         logger.debug(f"Copying {fp_in} to {fp_out}...")
-        fout = shutil.copy2(fp_in, fp_out)
+        if copyMetadata:
+            fout = shutil.copy2(fp_in, fp_out)
+        else:
+            fout = shutil.copyfile(fp_in, fp_out)
     except Exception as e:
         logger.error(f"Copying {fp_in} to {fp_out} failed: {e}.")
         fout = None
     return fout
+
+
+def systemCopyFiles(listFiles, maxWorkers=8, copyMetadata=True, hardLink=False):
+    """
+    Copies a list of (fp_in, fp_out) pairs concurrently with systemCopyFile.
+    Returns the list of copied files in the same order, None for failures.
+    """
+    if len(listFiles) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(listFiles))) as executor:
+        return list(
+            executor.map(
+                lambda files: systemCopyFile(
+                    *files, copyMetadata=copyMetadata, hardLink=hardLink
+                ),
+                listFiles,
+            )
+        )
+
+
+def gzipFile(src, dst, nproc=1, compressLevel=1):
+    """
+    Compresses src into dst, with pigz using nproc threads when it is
+    available and with the gzip module otherwise. The files are only
+    archived, so the fast compressLevel=1 is the default. zlib releases
+    the GIL while compressing, so several files can be gzip'ed
+    concurrently from threads.
+    """
+    logger.debug(f"gzip'ing {src}")
+    dst = pathlib.Path(dst)
+    # Raises before anything is written if src is missing
+    os.stat(src)
+    # Compressed into a temporary file next to dst, which only replaces dst
+    # once the compression succeeded
+    fd, tmpPath = tempfile.mkstemp(
+        prefix=f".{dst.name}.", suffix=".tmp", dir=dst.parent
+    )
+    try:
+        os.fchmod(fd, 0o644)
+        with open(fd, "wb") as fp_out:
+            pigz = shutil.which("pigz")
+            if pigz is not None:
+                proc = subprocess.run(
+                    [pigz, "-c", f"-{compressLevel}", "-p", str(nproc), str(src)],
+                    stdout=fp_out,
+                )
+                if proc.returncode != 0:
+                    logger.warning(f"pigz failed on {src}, falling back to gzip")
+        if pigz is None or proc.returncode != 0:
+            with open(src, "rb") as fp_in:
+                with gzip.open(tmpPath, "wb", compresslevel=compressLevel) as fp_out:
+                    # zlib reads the memory-mapped file straight from the page
+                    # cache, empty files cannot be mapped
+                    if os.fstat(fp_in.fileno()).st_size > 0:
+                        with mmap.mmap(
+                            fp_in.fileno(), 0, access=mmap.ACCESS_READ
+                        ) as mm_in:
+                            fp_out.write(mm_in)
+        os.replace(tmpPath, dst)
+    except BaseException:
+        os.unlink(tmpPath)
+        raise
@@ -33,6 +33,7 @@ import pathlib
 import tempfile
 import xmltodict
 import json
+import functools
 
 from edna2.utils import UtilsConfig
 from edna2.utils import UtilsLogging
@@ -40,13 +41,18 @@ from edna2.utils import UtilsLogging
 logger = UtilsLogging.getLogger()
 
 def jsonFromXML(filePath) -> str:
-    with open(filePath,"r") as fp:
-        xmlFile = fp.read()
-    orderedDict = xmltodict.parse(xmlFile)
-    return json.dumps(orderedDict)
+    filePath = str(filePath)
+    return _jsonFromXML(filePath, os.stat(filePath).st_mtime_ns)
 
 def dictfromXML(filePath) -> dict:
+    # A new dict is built from the cached JSON string on each call, callers
+    # are free to modify it
+    return json.loads(jsonFromXML(filePath))
+
+@functools.lru_cache(maxsize=16)
+def _jsonFromXML(filePath, mtime) -> str:
+    # mtime is only part of the cache key, a rewritten file is parsed again
     with open(filePath,"r") as fp:
         xmlFile = fp.read()
     orderedDict = xmltodict.parse(xmlFile)
-    return json.loads(json.dumps(orderedDict))
+    return json.dumps(orderedDict)
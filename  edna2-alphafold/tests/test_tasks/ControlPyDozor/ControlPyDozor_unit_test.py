@@ -0,0 +1,99 @@
+#
+# Copyright (c) European Synchrotron Radiation Facility (ESRF)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+__authors__ = ["D. Fastus"]
+__license__ = "MIT"
+__date__ = "16/10/2026"
+
+import unittest
+
+from edna2.tasks.ControlPyDozor import ControlPyDozor
+from edna2.tasks.ControlPyDozor import ExecPyDozor
+
+
+class ControlPyDozorUnitTest(unittest.TestCase):
+    def testCreateListOfBatches(self):
+        # Negative end number: full range in one batch
+        self.assertEqual([(1, -1)], ControlPyDozor.createListOfBatches(1, -1, 2))
+        self.assertEqual(
+            [(1, 2), (3, 4), (5, 5)], ControlPyDozor.createListOfBatches(1, 5, 2)
+        )
+        self.assertEqual(
+            [(3, 7), (8, 9)], ControlPyDozor.createListOfBatches(3, 9, 5)
+        )
+        self.assertEqual([(1, 5)], ControlPyDozor.createListOfBatches(1, 5, None))
+        # batchSize read from the config is a string
+        self.assertEqual(
+            [(1, 3), (4, 5)], ControlPyDozor.createListOfBatches(1, 5, "3")
+        )
+
+    def testImageQualityIndicators(self):
+        listImageDozor = [
+            {
+                "angle": 10.0 + 0.1 * index,
+                "image": "image_{0}".format(index),
+                "number": index + 1,
+                "spotsNumOf": 10 * index,
+                "spotsIntAver": 0,
+                "spotScore": 0.5 * index,
+                "mainScore": 0.5 * index,
+                "visibleResolution": 2.0 + index,
+                "spotsResolution": 2.0 + index,
+            }
+            for index in range(3)
+        ]
+        arrayImageQualityIndicators = ControlPyDozor.createImageQualityIndicators(
+            listImageDozor
+        )
+        self.assertEqual([1, 2, 3], arrayImageQualityIndicators["number"].tolist())
+        self.assertEqual(
+            [0, 10, 20], arrayImageQualityIndicators["dozorSpotsNumOf"].tolist()
+        )
+        listImageQualityIndicators = ControlPyDozor.imageQualityIndicatorsToList(
+            arrayImageQualityIndicators,
+            [imageDozor["image"] for imageDozor in listImageDozor],
+        )
+        self.assertEqual(3, len(listImageQualityIndicators))
+        self.assertEqual(
+            {
+                "angle": 10.2,
+                "image": "image_2",
+                "number": 3,
+                "dozorScore": 1.0,
+                "dozorSpotScore": 1.0,
+                "dozorSpotsNumOf": 20,
+                "dozorVisibleResolution": 4.0,
+                "dozorSpotsResolution": 4.0,
+            },
+            listImageQualityIndicators[2],
+        )
+        self.assertIsInstance(listImageQualityIndicators[2]["number"], int)
+
+    def testParseOutputEmptyLog(self):
+        # No rows: the master file, which doesn't exist here, isn't opened
+        inData = {
+            "masterFile": "/nonexistent/image_master.h5",
+            "firstImageNumber": 1,
+            "lastImageNumber": 10,
+        }
+        execPyDozor = ExecPyDozor(inData=inData)
+        result = execPyDozor.parseOutput(inData, ["", "   ", " | | \n"])
+        self.assertEqual([], result["imageDozor"])
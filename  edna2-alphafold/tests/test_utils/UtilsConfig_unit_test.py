@@ -55,6 +55,12 @@ class UtilsConfigUnitTest(unittest.TestCase):
         sections = config.sections()
         self.assertTrue("ExecDozor" in sections)
 
+    def test_getConfig_caseSensitive(self):
+        config = UtilsConfig.getConfig(site="maxiv_biomax", caseSensitive=True)
+        self.assertTrue("autoPROC_HIGHLIGHT" in config["AutoPROCTask"])
+        config = UtilsConfig.getConfig(site="maxiv_biomax")
+        self.assertTrue("autoproc_highlight" in config["AutoPROCTask"])
+
     def test_getTaskConfig(self):
         taskName = "ExecDozor"
         dictConfig = UtilsConfig.getTaskConfig(taskName, site="esrf_id30a2")
@@ -63,3 +69,20 @@ class UtilsConfigUnitTest(unittest.TestCase):
         dictConfig = UtilsConfig.getTaskConfig(taskName, site="esrf_id30a2")
         self.assertTrue("username" in dictConfig)
         self.assertEqual(dictConfig["username"], os.environ["ISPyB_user"])
+
+    def test_get_substitutesEnvironPerCall(self):
+        # The parsed config is cached, the ${} substitution is not
+        oldSite = os.environ.get("EDNA2_SITE")
+        UtilsConfig.setSite("esrf_id30a2")
+        try:
+            self.assertEqual(UtilsConfig.get("ISPyB", "username"), "ispybuser")
+            os.environ["ISPyB_user"] = "otheruser"
+            self.assertEqual(UtilsConfig.get("ISPyB", "username"), "otheruser")
+            self.assertEqual(
+                UtilsConfig.get("ISPyB", "no_such_option", "default"), "default"
+            )
+        finally:
+            if oldSite is None:
+                del os.environ["EDNA2_SITE"]
+            else:
+                UtilsConfig.setSite(oldSite)
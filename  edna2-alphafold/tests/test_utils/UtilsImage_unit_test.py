@@ -81,6 +81,21 @@ class UtilsImageUnitTest(unittest.TestCase):
         self.assertEqual(refH5Master2, str(h5MasterFilePath))
         self.assertEqual(refH5Data2, str(h5DataFilePath))
 
+    def test_getH5FilePath_pathAndStr(self):
+        file1 = "/data/id30a1/inhouse/opid30a1/mesh-opid30a1_1_0001.h5"
+        resultStr = UtilsImage.getH5FilePath(file1, isFastMesh=True)
+        resultPath = UtilsImage.getH5FilePath(pathlib.Path(file1), isFastMesh=True)
+        self.assertEqual(resultStr, resultPath)
+        self.assertEqual("mesh-opid30a1_1_1_master.h5", resultPath[0].name)
+
+    def test_eiger_template_to_image(self):
+        fmt = "/data/id30a1/inhouse/opid30a1/mesh-opid30a1_1_####.h5"
+        for num, fileNumber in ((1, 1), (100, 1), (101, 2), (200, 2), (201, 3)):
+            self.assertEqual(
+                f"/data/id30a1/inhouse/opid30a1/mesh-opid30a1_1_1_data_{fileNumber:06d}.h5",
+                UtilsImage.eiger_template_to_image(fmt, num),
+            )
+
     def test_splitPrefixRunNumber(self):
         path = pathlib.Path(
             "/data/scisoft/pxsoft/data/EDNA2_INDEXING/id23eh1/EX1/PsPL7C-252_1_0001.cbf"
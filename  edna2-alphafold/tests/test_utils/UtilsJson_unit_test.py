@@ -0,0 +1,93 @@
+#
+# Copyright (c) European Synchrotron Radiation Facility (ESRF)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__authors__ = ["D. Fastus"]
+__license__ = "MIT"
+__date__ = "16/10/2026"
+
+import json
+import math
+import pathlib
+import tempfile
+import unittest
+
+import numpy
+
+from edna2.utils import UtilsJson
+
+
+class UtilsJsonUnitTest(unittest.TestCase):
+    def test_writeJson(self):
+        data = {
+            "name": "autoPROC",
+            "shells": [{"rmerge": 4.5, "nTotalObservations": 1234}],
+            "file": pathlib.Path("/data/results/report.pdf"),
+        }
+        with tempfile.TemporaryDirectory() as tmpDir:
+            jsonPath = pathlib.Path(tmpDir) / "data.json"
+            UtilsJson.writeJson(jsonPath, data)
+            with open(jsonPath) as fp:
+                dataRead = json.load(fp)
+        self.assertEqual(data["shells"], dataRead["shells"])
+        self.assertEqual("/data/results/report.pdf", dataRead["file"])
+
+    def test_writeJson_nanNumpy(self):
+        data = {
+            "rmerge": float("nan"),
+            "isigma": float("inf"),
+            "nObs": numpy.int64(3),
+        }
+        with tempfile.TemporaryDirectory() as tmpDir:
+            jsonPath = pathlib.Path(tmpDir) / "data.json"
+            UtilsJson.writeJson(jsonPath, data)
+            with open(jsonPath) as fp:
+                dataRead = json.load(fp)
+        self.assertTrue(math.isnan(dataRead["rmerge"]))
+        self.assertEqual(float("inf"), dataRead["isigma"])
+        self.assertEqual("3", dataRead["nObs"])
+
+    def test_dumpsLoads(self):
+        data = {
+            "subWedge": [{"image": [{"path": "/data/x_1_000001.h5"}]}],
+            "resCutoff": 1.85,
+            "workingDirectory": pathlib.Path("/tmp/edna2"),
+            1: None,
+        }
+        dataRead = UtilsJson.loads(UtilsJson.dumps(data))
+        self.assertEqual(data["subWedge"], dataRead["subWedge"])
+        self.assertEqual(1.85, dataRead["resCutoff"])
+        self.assertEqual("/tmp/edna2", dataRead["workingDirectory"])
+        self.assertIsNone(dataRead["1"])
+        self.assertEqual({}, UtilsJson.loads(UtilsJson.dumps({})))
+
+    def test_dumpsLoads_nanNumpy(self):
+        data = {
+            "rmerge": float("nan"),
+            "isigma": float("-inf"),
+            "nObs": numpy.int64(3),
+            "big": 2**70,
+        }
+        dataRead = UtilsJson.loads(UtilsJson.dumps(data))
+        self.assertTrue(math.isnan(dataRead["rmerge"]))
+        self.assertEqual(float("-inf"), dataRead["isigma"])
+        self.assertEqual("3", dataRead["nObs"])
+        self.assertEqual(2**70, dataRead["big"])
@@ -24,6 +24,9 @@ __license__ = "MIT"
 __date__ = "21/04/2019"
 
 
+import gzip
+import pathlib
+import tempfile
 import unittest
 
 from edna2.utils import UtilsPath
@@ -189,4 +192,74 @@ class UtilsTestUnitTest(unittest.TestCase):
     def test_stripDataDirectoryPrefix(self):
         data_directory = "/gpfs/easy/data/id30a2/inhouse/opid30a2"
         new_data_directory = UtilsPath.stripDataDirectoryPrefix(data_directory)
-        self.assertEqual(str(new_data_directory), "/data/id30a2/inhouse/opid30a2")
\ No newline at end of file
+        self.assertEqual(str(new_data_directory), "/data/id30a2/inhouse/opid30a2")
+
+    def test_systemCopyFiles(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            tmpDir = pathlib.Path(tmpDir)
+            listFiles = []
+            for index in range(3):
+                src = tmpDir / f"file_{index}.txt"
+                src.write_text(f"file {index}")
+                listFiles.append((src, tmpDir / f"copy_{index}.txt"))
+            listFiles.append((tmpDir / "missing.txt", tmpDir / "copy_missing.txt"))
+            listResult = UtilsPath.systemCopyFiles(listFiles)
+            self.assertEqual(4, len(listResult))
+            self.assertIsNone(listResult[3])
+            for index in range(3):
+                self.assertEqual(str(listFiles[index][1]), str(listResult[index]))
+                self.assertEqual(f"file {index}", listFiles[index][1].read_text())
+            listResult = UtilsPath.systemCopyFiles(listFiles[:3], copyMetadata=False)
+            for index in range(3):
+                self.assertEqual(str(listFiles[index][1]), str(listResult[index]))
+                self.assertEqual(f"file {index}", listFiles[index][1].read_text())
+            listLinks = [
+                (src, tmpDir / f"link_{index}.txt")
+                for index, (src, _) in enumerate(listFiles)
+            ]
+            listResult = UtilsPath.systemCopyFiles(listLinks, hardLink=True)
+            self.assertIsNone(listResult[3])
+            for index in range(3):
+                self.assertEqual(str(listLinks[index][1]), str(listResult[index]))
+                self.assertTrue(listLinks[index][0].samefile(listLinks[index][1]))
+
+    def test_waitForFile(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            filePath = pathlib.Path(tmpDir) / "image_000001.h5"
+            filePath.write_bytes(b"0" * 200)
+            hasTimedOut, finalSize = UtilsPath.waitForFile(
+                filePath, expectedSize=100, timeOut=5
+            )
+            self.assertFalse(hasTimedOut)
+            self.assertEqual(200, finalSize)
+            hasTimedOut, finalSize = UtilsPath.waitForFile(
+                pathlib.Path(tmpDir) / "missing.h5", timeOut=0.5
+            )
+            self.assertTrue(hasTimedOut)
+            self.assertIsNone(finalSize)
+
+    def test_gzipFile(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            tmpDir = pathlib.Path(tmpDir)
+            src = tmpDir / "aimless_unmerged.mtz"
+            src.write_bytes(b"MTZ " * 1000)
+            dst = tmpDir / "aimless_unmerged.mtz.gz"
+            UtilsPath.gzipFile(src, dst)
+            with gzip.open(dst, "rb") as fp:
+                self.assertEqual(src.read_bytes(), fp.read())
+            empty = tmpDir / "empty.mtz"
+            empty.touch()
+            UtilsPath.gzipFile(empty, tmpDir / "empty.mtz.gz")
+            with gzip.open(tmpDir / "empty.mtz.gz", "rb") as fp:
+                self.assertEqual(b"", fp.read())
+            with self.assertRaises(FileNotFoundError):
+                UtilsPath.gzipFile(tmpDir / "missing.mtz", tmpDir / "missing.mtz.gz")
+            self.assertEqual(
+                [
+                    "aimless_unmerged.mtz",
+                    "aimless_unmerged.mtz.gz",
+                    "empty.mtz",
+                    "empty.mtz.gz",
+                ],
+                sorted(path.name for path in tmpDir.iterdir()),
+            )
@@ -0,0 +1,50 @@
+#
+# Copyright (c) European Synchrotron Radiation Facility (ESRF)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+__authors__ = ["D. Fastus"]
+__license__ = "MIT"
+__date__ = "16/10/2026"
+
+import os
+import pathlib
+import tempfile
+import unittest
+
+from edna2.utils import UtilsXML
+
+
+class UtilsXMLUnitTest(unittest.TestCase):
+    def test_dictfromXML(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            xmlPath = pathlib.Path(tmpDir) / "autoPROC.xml"
+            xmlPath.write_text("<AutoProc><spaceGroup>P 21 21 21</spaceGroup></AutoProc>")
+            dictXml = UtilsXML.dictfromXML(xmlPath)
+            self.assertEqual("P 21 21 21", dictXml["AutoProc"]["spaceGroup"])
+            # Modifying the result must not change the cached content
+            dictXml["AutoProc"].pop("spaceGroup")
+            dictXml = UtilsXML.dictfromXML(xmlPath)
+            self.assertEqual("P 21 21 21", dictXml["AutoProc"]["spaceGroup"])
+            # A rewritten file is parsed again
+            xmlPath.write_text("<AutoProc><spaceGroup>P 1</spaceGroup></AutoProc>")
+            os.utime(xmlPath, ns=(0, 0))
+            dictXml = UtilsXML.dictfromXML(xmlPath)
+            self.assertEqual("P 1", dictXml["AutoProc"]["spaceGroup"])